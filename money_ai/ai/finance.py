@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import List, Dict
 
+import numpy as np
+
 @dataclass
 class Transaction:
     date: str
@@ -9,6 +11,16 @@ class Transaction:
     category: str
     confidence: float
 
+def _status(income: float, expense: float, net: float) -> str:
+    # status simple
+    if income <= 0 and expense > 0:
+        return "red"
+    if net < 0:
+        return "red"
+    if net < max(1.0, income * 0.05):
+        return "yellow"
+    return "green"
+
 def build_summary(txs: List[Transaction], month: str) -> Dict:
     """
     Resumen mensual simple (Fase 1):
@@ -29,38 +41,284 @@ def build_summary(txs: List[Transaction], month: str) -> Dict:
 
     top_spend = sorted(by_cat.items(), key=lambda x: x[1], reverse=True)[:5]
 
-    # status simple
-    if income <= 0 and expense > 0:
-        status = "red"
-    else:
-        if net < 0:
-            status = "red"
-        elif net < max(1.0, income * 0.05):
-            status = "yellow"
-        else:
-            status = "green"
-
     return {
         "month": month,
         "income": round(income, 2),
         "expense": round(expense, 2),
         "net": round(net, 2),
-        "status": status,
+        "status": _status(income, expense, net),
         "top_spend": [{"category": c, "amount": round(a, 2)} for c, a in top_spend],
         "count_records": len(month_txs),
     }
 
+def build_summary_columns(amounts: np.ndarray, cats: np.ndarray, categories: List[str], month: str) -> Dict:
+    """
+    Igual que build_summary pero sobre columnas ya filtradas al mes
+    (montos y códigos de categoría, ver core/txcache.py).
+    """
+    income = float(amounts[amounts > 0].sum())
+    spend = amounts < 0
+    expense = 0.0 - float(amounts[spend].sum())
+    net = income - expense
+
+    # gasto por categoría; empates en el orden de primera aparición, como build_summary
+    spend_cats = cats[spend]
+    codes, first = np.unique(spend_cats, return_index=True)
+    totals = np.bincount(spend_cats, weights=-amounts[spend], minlength=len(categories))[codes] if len(codes) else np.zeros(0)
+    order = np.lexsort((first, -totals))[:5]
+
+    return {
+        "month": month,
+        "income": round(income, 2),
+        "expense": round(expense, 2),
+        "net": round(net, 2),
+        "status": _status(income, expense, net),
+        "top_spend": [{"category": categories[codes[i]], "amount": round(float(totals[i]), 2)} for i in order],
+        "count_records": int(len(amounts)),
+    }
+
+# -------------------------
+# Tendencias por categoría
+# -------------------------
+TREND_WINDOWS = (3, 6, 12)
+
+def month_index(month: str) -> int:
+    """
+    "YYYY-MM" -> meses desde 1970-01 (mismo eje que datetime64[M]).
+    """
+    if len(month) != 7 or month[4] != "-" or not (month[:4] + month[5:]).isdigit():
+        raise ValueError(f"Mes inválido: {month}")
+    y, m = int(month[:4]), int(month[5:])
+    if not 1 <= m <= 12:
+        raise ValueError(f"Mes inválido: {month}")
+    return (y - 1970) * 12 + (m - 1)
+
+def month_label(idx: int) -> str:
+    return f"{1970 + idx // 12:04d}-{idx % 12 + 1:02d}"
+
+def build_trends(days: np.ndarray, amounts: np.ndarray, cats: np.ndarray, categories: List[str],
+                 start: int, end: int, kind: str = "expense", windows=TREND_WINDOWS) -> Dict:
+    """
+    Series mensuales por categoría entre start y end (índices de month_index):
+    - series: total del mes (gasto en positivo si kind="expense")
+    - avg_N: promedio móvil de N meses que terminan en ese mes
+    - mom_delta / mom_pct: cambio contra el mes anterior
+    Una sola pasada: matriz categoría x mes con bincount, promedios con cumsum.
+    Los meses anteriores a start entran solo como historia de los promedios.
+    """
+    months = (days.astype("datetime64[D]").astype("datetime64[M]")).astype(np.int64)
+    first = int(months.min()) if len(months) else start
+    lo = min(start, end) - max(windows)  # historia para el primer promedio
+    n_months = end - lo + 1
+
+    if kind == "income":
+        sel = amounts > 0
+        values = amounts
+    else:
+        sel = amounts < 0
+        values = -amounts
+    sel &= (months >= lo) & (months <= end)
+
+    n_cats = len(categories)
+    flat = cats[sel].astype(np.int64) * n_months + (months[sel] - lo)
+    matrix = np.bincount(flat, weights=values[sel], minlength=n_cats * n_months).reshape(n_cats, n_months)
+
+    # meses con historia real desde el primer registro del usuario (divisor del promedio)
+    t = np.arange(lo, end + 1)
+    seen = np.clip(t - first + 1, 1, None)
+    csum = np.concatenate([np.zeros((n_cats, 1)), np.cumsum(matrix, axis=1)], axis=1)
+    averages = {}
+    for w in windows:
+        idx = np.arange(1, n_months + 1)
+        rolled = csum[:, idx] - csum[:, np.clip(idx - w, 0, None)]
+        averages[w] = rolled / np.minimum(w, seen)
+
+    prev = np.concatenate([np.zeros((n_cats, 1)), matrix[:, :-1]], axis=1)
+    delta = matrix - prev
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(prev > 0, delta / prev * 100.0, np.nan)
+
+    view = slice(start - lo, n_months)
+    totals = matrix[:, view].sum(axis=1)
+    order = [i for i in np.argsort(-totals, kind="stable") if totals[i] > 0]
+
+    def r2(row):
+        return [None if np.isnan(v) else round(float(v), 2) for v in row]
+
+    out = []
+    for i in order:
+        item = {
+            "category": categories[i],
+            "total": round(float(totals[i]), 2),
+            "series": r2(matrix[i, view]),
+        }
+        for w in windows:
+            item[f"avg_{w}"] = r2(averages[w][i, view])
+        item["mom_delta"] = r2(delta[i, view])
+        item["mom_pct"] = r2(pct[i, view])
+        out.append(item)
+
+    return {
+        "start": month_label(start),
+        "end": month_label(end),
+        "kind": kind,
+        "months": [month_label(m) for m in range(start, end + 1)],
+        "categories": out,
+    }
+
+# -------------------------
+# Pronóstico de fin de mes
+# -------------------------
+def daily_run_rate(days: np.ndarray, amounts: np.ndarray, cats: np.ndarray, n_cats: int,
+                   lo: int, hi: int) -> np.ndarray:
+    """
+    Gasto diario promedio por categoría en los días [lo, hi) (en positivo).
+    """
+    n_days = hi - lo
+    if n_days <= 0:
+        return np.zeros(n_cats)
+    sel = (amounts < 0) & (days >= lo) & (days < hi)
+    return np.bincount(cats[sel], weights=-amounts[sel], minlength=n_cats) / n_days
+
+def build_forecast(month: str, actual_income: float, actual_expense: float,
+                   scheduled_income: float, scheduled_expense: float,
+                   pending: List[Dict], rates: np.ndarray, categories: List[str],
+                   remaining_days: int) -> Dict:
+    """
+    Cierre proyectado del mes:
+    - lo que ya pasó (actual_*)
+    - records ya registrados con fecha posterior al corte (scheduled_*)
+    - reglas recurrentes activas que aún no se generan (pending: name, amount, day)
+    - gasto no recurrente: run-rate diario por categoría x días que faltan
+    """
+    rec_income = sum((p["amount"] for p in pending if p["amount"] > 0), 0.0)
+    rec_expense = sum((-p["amount"] for p in pending if p["amount"] < 0), 0.0)
+
+    by_cat = rates * max(0, remaining_days)
+    run_rate = float(by_cat.sum())
+    top = [i for i in np.argsort(-by_cat, kind="stable")[:5] if by_cat[i] > 0]
+
+    income = actual_income + scheduled_income + rec_income
+    expense = actual_expense + scheduled_expense + rec_expense + run_rate
+    net = income - expense
+
+    return {
+        "month": month,
+        "remaining_days": int(remaining_days),
+        "actual": {
+            "income": round(actual_income, 2),
+            "expense": round(actual_expense, 2),
+            "net": round(actual_income - actual_expense, 2),
+        },
+        "scheduled": {
+            "income": round(scheduled_income, 2),
+            "expense": round(scheduled_expense, 2),
+        },
+        "recurring_pending": {
+            "income": round(rec_income, 2),
+            "expense": round(rec_expense, 2),
+            "items": pending,
+        },
+        "run_rate": {
+            "expense": round(run_rate, 2),
+            "by_category": [
+                {"category": categories[i], "daily": round(float(rates[i]), 2), "projected": round(float(by_cat[i]), 2)}
+                for i in top
+            ],
+        },
+        "projected": {
+            "income": round(income, 2),
+            "expense": round(expense, 2),
+            "net": round(net, 2),
+            "status": _status(income, expense, net),
+        },
+    }
+
+def explain_forecast(forecast: Dict) -> str:
+    p = forecast["projected"]
+    if forecast["remaining_days"] <= 0:
+        return f"Mes cerrado: {p['net']:,.2f} neto."
+    if p["status"] == "red":
+        return (f"Al ritmo actual cerrarías en rojo por {abs(p['net']):,.2f}. "
+                f"Faltan {forecast['remaining_days']} días para ajustar.")
+    if p["status"] == "yellow":
+        return f"Vas justo: cerrarías con {p['net']:,.2f}. Cuida el gasto variable lo que resta del mes."
+    return f"Vas bien: cerrarías con {p['net']:,.2f} neto si mantienes el ritmo."
+
+# -------------------------
+# Picos de gasto
+# -------------------------
+def transaction_spikes(spend: np.ndarray, mean: np.ndarray, std: np.ndarray, count: np.ndarray,
+                       k: float, min_count: int) -> np.ndarray:
+    """
+    z-score de cada gasto contra el historial de su categoría (arrays alineados
+    por transacción). Devuelve z, o NaN donde no aplica (poco historial, std 0).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (spend - mean) / std
+    ok = (count >= min_count) & (std > 0) & (z > k)
+    return np.where(ok, z, np.nan)
+
+def category_spikes(spend: np.ndarray, rows: np.ndarray, base: int,
+                    month: int, k: float, history: int = 12, min_months: int = 3):
+    """
+    Gasto del mes por categoría contra los `history` meses anteriores (desde el
+    primer registro del usuario). spend[cat, m - base] / rows[m - base]: gasto
+    y records por mes ya agregados (ver core/txcache.MonthTotals).
+    Devuelve (códigos, total del mes, promedio, z) de las categorías por
+    encima de promedio + k * desviación.
+    """
+    empty = (np.zeros(0, dtype=np.int64),) + (np.zeros(0),) * 3
+    used = np.flatnonzero(rows > 0)
+    if not len(used):
+        return empty
+    lo = max(month - history, base + int(used[0]))
+    n_months = month - lo + 1
+
+    # mes anterior al primer registro (lo > month) o poco historial
+    if lo > month or n_months - 1 < min_months:
+        return empty
+
+    cols = np.arange(lo, month + 1) - base
+    inside = (cols >= 0) & (cols < spend.shape[1])
+    matrix = np.zeros((spend.shape[0], n_months))
+    matrix[:, inside] = spend[:, cols[inside]]
+    past, current = matrix[:, :-1], matrix[:, -1]
+    mean = past.mean(axis=1)
+    std = past.std(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (current - mean) / std
+    hit = np.flatnonzero((std > 0) & (z > k))
+    if not len(hit):
+        return empty
+    return hit, current[hit], mean[hit], z[hit]
+
+def _alerts_text(alerts: List[Dict]) -> str:
+    if not alerts:
+        return ""
+    a = alerts[0]
+    if a["type"] == "category":
+        text = (f" Ojo: en {a['category']} llevas {a['amount']:,.2f}, "
+                f"muy arriba de tu promedio mensual de {a['mean']:,.2f}.")
+    else:
+        text = (f" Ojo: cargo inusual de {a['amount']:,.2f} en {a['description']} "
+                f"({a['category']}, normalmente {a['mean']:,.2f}).")
+    if len(alerts) > 1:
+        text += f" Hay {len(alerts) - 1} alerta(s) más."
+    return text
+
 def explain(summary: Dict) -> str:
     income = summary["income"]
     expense = summary["expense"]
     net = summary["net"]
     status = summary["status"]
+    alerts = _alerts_text(summary.get("alerts") or [])
 
     if income <= 0 and expense > 0:
-        return "Solo detecté gastos este mes. Agrega ingresos (manual o recurrentes) para evaluar tu flujo."
+        return "Solo detecté gastos este mes. Agrega ingresos (manual o recurrentes) para evaluar tu flujo." + alerts
 
     if status == "red":
-        return f"Mes en rojo. Te faltaron {abs(net):,.2f} para cubrir tus gastos."
+        return f"Mes en rojo. Te faltaron {abs(net):,.2f} para cubrir tus gastos." + alerts
     if status == "yellow":
-        return f"Mes justo. Cerraste con {net:,.2f}. Si bajas un poco el gasto fijo, mejoras margen."
-    return f"Buen mes. Cerraste con {net:,.2f} neto. Mantén el control y evita picos de gasto."
+        return f"Mes justo. Cerraste con {net:,.2f}. Si bajas un poco el gasto fijo, mejoras margen." + alerts
+    return f"Buen mes. Cerraste con {net:,.2f} neto. Mantén el control y evita picos de gasto." + alerts
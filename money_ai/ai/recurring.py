@@ -0,0 +1,167 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# =========================
+# Descubrimiento de recurrentes (renta, nómina, suscripciones)
+# =========================
+# 1) hash: descripción normalizada -> grupo (sin números de referencia, fechas, etc.)
+# 2) scan ordenado por (grupo, signo, log|monto|): cortes donde el monto salta
+#    más de AMOUNT_TOLERANCE -> bandas de monto
+# 3) scan ordenado por (banda, día): intervalos entre apariciones ~ mensuales
+MIN_OCCURRENCES = 3
+AMOUNT_TOLERANCE = 0.15      # +-15% entre montos consecutivos de la misma banda
+MONTHLY_MIN_DAYS = 25
+MONTHLY_MAX_DAYS = 36
+STALE_DAYS = 45              # sin aparecer en este tiempo: probablemente ya no aplica
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+_DIGIT_WORDS = re.compile(r"\S*\d\S*")
+_NOISE = re.compile(r"[^A-Z]+")
+
+
+def description_key(text: str) -> str:
+    """
+    "NETFLIX.COM 8473 CDMX 05/03" -> "NETFLIX COM CDMX"
+    Palabras con dígitos fuera; acentos y puntuación fuera.
+    """
+    t = (text or "").upper()
+    if not t.isascii():
+        t = unicodedata.normalize("NFKD", t)
+        t = "".join(ch for ch in t if not unicodedata.combining(ch))
+    t = _NOISE.sub(" ", _DIGIT_WORDS.sub(" ", t))
+    return t.strip()[:60]
+
+
+def discover(days: np.ndarray, descriptions: Sequence[str], amounts: np.ndarray,
+             categories: Sequence[str], today: int) -> List[Dict]:
+    """
+    Candidatos a regla mensual, de mayor a menor confianza.
+    days: días desde 1970-01-01; today: mismo eje (para descartar lo que ya no aparece).
+    """
+    n = len(days)
+    if n < MIN_OCCURRENCES:
+        return []
+
+    # 1) grupos por hash de la descripción normalizada (se normaliza cada texto distinto una vez)
+    keys: Dict[str, int] = {}
+    norm_cache: Dict[str, int] = {}
+    group = np.empty(n, dtype=np.int64)
+    for i, d in enumerate(descriptions):
+        g = norm_cache.get(d)
+        if g is None:
+            k = description_key(d)
+            g = keys.setdefault(k, len(keys)) if k else -1
+            norm_cache[d] = g
+        group[i] = g
+    names = list(keys)
+
+    sign = np.sign(amounts).astype(np.int64)
+    keep = (group >= 0) & (sign != 0)
+    idx = np.flatnonzero(keep)
+    if len(idx) < MIN_OCCURRENCES:
+        return []
+    mag = np.log(np.abs(amounts[idx]))
+
+    # 2) bandas de monto: orden por (grupo, signo, magnitud) y corte donde cambia algo
+    order = idx[np.lexsort((mag, sign[idx], group[idx]))]
+    g, s, m = group[order], sign[order], np.log(np.abs(amounts[order]))
+    brk = np.ones(len(order), dtype=bool)
+    brk[1:] = (g[1:] != g[:-1]) | (s[1:] != s[:-1]) | (np.diff(m) > np.log1p(AMOUNT_TOLERANCE))
+    band = np.cumsum(brk) - 1
+
+    sizes = np.bincount(band)
+    big = sizes[band] >= MIN_OCCURRENCES
+    order, band = order[big], band[big]
+    if not len(order):
+        return []
+
+    # 3) dentro de cada banda, por fecha
+    o = np.lexsort((days[order], band))
+    rows, band = order[o], band[o]
+    starts = np.flatnonzero(np.r_[True, band[1:] != band[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+
+    out = []
+    for a, b in zip(starts.tolist(), ends.tolist()):
+        r = rows[a:b]
+        d = days[r]
+        # varias apariciones el mismo día (duplicados del import) cuentan como una
+        d, first = np.unique(d, return_index=True)
+        r = r[first]
+        if len(d) < MIN_OCCURRENCES:
+            continue
+        gaps = np.diff(d)
+        monthly = (gaps >= MONTHLY_MIN_DAYS) & (gaps <= MONTHLY_MAX_DAYS)
+        regularity = float(monthly.mean())
+        if regularity < 0.5 or not MONTHLY_MIN_DAYS <= float(np.median(gaps)) <= MONTHLY_MAX_DAYS:
+            continue
+
+        amt = amounts[r]
+        cv = float(np.std(amt) / abs(np.mean(amt)))
+        stability = max(0.0, 1.0 - cv / AMOUNT_TOLERANCE)
+        support = min(1.0, len(d) / 6.0)
+        last = int(d[-1])
+        fresh = 1.0 if today - last <= STALE_DAYS else 0.5
+        confidence = round((0.5 * regularity + 0.3 * stability + 0.2 * support) * fresh, 2)
+
+        dom = (d.astype("timedelta64[D]") + _EPOCH).astype(object)
+        day_of_month = int(np.median([x.day for x in dom]))
+        cats = Counter(categories[i] for i in r.tolist())
+
+        out.append({
+            "name": names[group[r[0]]].title(),
+            "amount": round(float(np.median(amt)), 2),
+            "category": cats.most_common(1)[0][0],
+            "schedule": "monthly",
+            "day_of_month": max(1, min(28, day_of_month)),
+            "occurrences": int(len(d)),
+            "first_date": dom[0].isoformat(),
+            "last_date": dom[-1].isoformat(),
+            "confidence": confidence,
+        })
+
+    out.sort(key=lambda c: (-c["confidence"], -abs(c["amount"])))
+    return out
+
+
+def covered(candidate: Dict, existing: Sequence) -> bool:
+    """
+    True si el candidato ya tiene regla: existing = [(description_key(nombre), monto)],
+    mismo nombre normalizado y monto parecido.
+    """
+    key = description_key(candidate["name"])
+    amount = candidate["amount"]
+    return any(
+        k == key and a * amount > 0 and abs(a - amount) <= AMOUNT_TOLERANCE * abs(a)
+        for k, a in existing
+    )
+
+
+def match_candidates(descriptions: Sequence[str], amounts: np.ndarray, candidates: List[Dict]) -> np.ndarray:
+    """
+    Índice del candidato (de discover) al que pertenece cada fila, o -1:
+    misma descripción normalizada, mismo signo y monto dentro de AMOUNT_TOLERANCE.
+    """
+    out = np.full(len(descriptions), -1, dtype=np.int64)
+    by_key: Dict[str, List[int]] = {}
+    for i, c in enumerate(candidates):
+        by_key.setdefault(description_key(c["name"]), []).append(i)
+    if not by_key:
+        return out
+
+    norm_cache: Dict[str, str] = {}
+    for row, (d, a) in enumerate(zip(descriptions, amounts.tolist())):
+        k = norm_cache.get(d)
+        if k is None:
+            k = norm_cache[d] = description_key(d)
+        for i in by_key.get(k, ()):
+            c = candidates[i]["amount"]
+            if a * c > 0 and abs(a - c) <= AMOUNT_TOLERANCE * abs(c):
+                out[row] = i
+                break
+    return out
@@ -0,0 +1,425 @@
+import csv
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# =========================
+# Lectura de estados de cuenta (xlsx / csv)
+# =========================
+# Compartido por import_amex_xlsx.py (cliente) y /imports (server).
+READ_CHUNK_ROWS = 5000  # filas por bloque
+
+# Palabras clave para detectar encabezados
+DATE_KEYS = ["fecha"]
+DESC_KEYS = ["descripción", "descripcion"]
+AMT_KEYS  = ["importe", "monto", "amount"]
+
+class StatementError(Exception):
+    pass
+
+# =========================
+# Perfiles por banco / formato
+# =========================
+@dataclass(frozen=True)
+class BankProfile:
+    """
+    Cómo leer el estado de cuenta de un banco.
+    - *_keys: palabras para encontrar el header y las columnas
+    - sign: multiplica el importe para llevarlo a la convención de la app
+      (gasto negativo / ingreso positivo). AMEX trae cargos positivos => -1
+    - dayfirst: fechas tipo 31/01/2026
+    - decimal_comma: montos tipo 1.234,56; None = se detecta por archivo
+      a partir de la columna de importe (ver DecimalDetector)
+    """
+    name: str
+    extensions: Tuple[str, ...]
+    date_keys: Tuple[str, ...] = tuple(DATE_KEYS)
+    desc_keys: Tuple[str, ...] = tuple(DESC_KEYS)
+    amt_keys: Tuple[str, ...] = tuple(AMT_KEYS)
+    sign: int = 1
+    dayfirst: bool = False
+    decimal_comma: Optional[bool] = False
+
+PROFILES: Dict[str, BankProfile] = {}
+
+def register_profile(profile: BankProfile) -> BankProfile:
+    """
+    Agrega (o reemplaza) un perfil. Para la detección por extensión gana
+    el primero registrado.
+    """
+    PROFILES[profile.name] = profile
+    return profile
+
+AMEX = register_profile(BankProfile(name="amex", extensions=(".xlsx", ".xlsm"), sign=-1))
+GENERIC_CSV = register_profile(BankProfile(
+    name="csv",
+    extensions=(".csv",),
+    date_keys=("fecha", "date"),
+    desc_keys=("descripción", "descripcion", "concepto", "description"),
+    amt_keys=("importe", "monto", "amount"),
+    sign=1,
+    dayfirst=True,
+    decimal_comma=None,  # los CSV vienen de bancos de todos lados: 1,234.56 o 1.234,56
+))
+
+def get_profile(name: Optional[str] = None, filename: Optional[str] = None) -> BankProfile:
+    if name:
+        if name not in PROFILES:
+            raise StatementError(f"Perfil desconocido: {name} (disponibles: {', '.join(PROFILES)})")
+        return PROFILES[name]
+
+    ext = os.path.splitext(filename or "")[1].lower()
+    for profile in PROFILES.values():
+        if ext in profile.extensions:
+            return profile
+    raise StatementError(f"Formato no soportado: {ext or '(sin extensión)'} (usa .xlsx o .csv)")
+
+def norm(s: str) -> str:
+    return str(s).strip().lower()
+
+def is_header_row(values, profile: BankProfile = AMEX) -> bool:
+    """
+    True si la fila tiene columnas tipo Fecha / Descripción / Importe/Monto.
+    """
+    row = [norm(x) for x in values]
+    has_date = any(any(k in cell for k in profile.date_keys) for cell in row)
+    has_desc = any(any(k in cell for k in profile.desc_keys) for cell in row)
+    has_amt  = any(any(k in cell for k in profile.amt_keys) for cell in row)
+    return has_date and has_desc and has_amt
+
+def detect_header_row(df_raw: pd.DataFrame, max_rows: int = 60, profile: BankProfile = AMEX):
+    """
+    df_raw viene sin header (header=None). Busca la fila donde aparezcan
+    columnas tipo Fecha / Descripción / Importe/Monto.
+    """
+    n = min(max_rows, len(df_raw))
+    for i in range(n):
+        if is_header_row(df_raw.iloc[i].tolist(), profile):
+            return i
+    return None
+
+def find_col(df: pd.DataFrame, keys):
+    cols = [norm(c) for c in df.columns]
+    for k in keys:
+        for idx, c in enumerate(cols):
+            if k in c:
+                return df.columns[idx]
+    return None
+
+def parse_amount_series(s: pd.Series, decimal_comma: bool = False) -> pd.Series:
+    """
+    Convierte "$1,234.56" / "1,234.56" / numérico a float
+    (con decimal_comma: "1.234,56")
+    """
+    x = s.astype(str)
+    if decimal_comma:
+        x = x.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    else:
+        x = x.str.replace(",", "", regex=False)
+    x = x.str.replace("$", "", regex=False).str.strip()
+    return pd.to_numeric(x, errors="coerce")
+
+# -------------------------
+# Separador decimal por archivo
+# -------------------------
+_THOUSANDS_ONLY = re.compile(r"^\d{1,3}([.,])\d{3}$")  # "1,234" / "1.234": no se sabe
+
+def decimal_vote(value) -> Optional[str]:
+    """
+    Qué dice un importe sobre el separador decimal:
+    "comma" / "dot" / "ambiguous" (ej. "1,234") / None (sin separadores o no es texto).
+    """
+    if not isinstance(value, str):
+        return None
+    x = re.sub(r"[^\d.,]", "", value)
+    has_dot, has_comma = "." in x, "," in x
+    if has_dot and has_comma:
+        return "comma" if x.rfind(",") > x.rfind(".") else "dot"
+    if not (has_dot or has_comma):
+        return None
+    sep = "," if has_comma else "."
+    if x.count(sep) > 1:
+        # "1.234.567" => el separador repetido es de miles
+        return "dot" if sep == "," else "comma"
+    if _THOUSANDS_ONLY.match(x):
+        return "ambiguous"
+    return "comma" if sep == "," else "dot"
+
+class DecimalDetector:
+    """
+    Decide decimal_comma para un archivo a medida que ve la columna de importe.
+    decimal_comma queda en None hasta ver un importe que lo resuelva; si el
+    archivo mezcla "12,50" con "12.50" es StatementError.
+    """
+
+    def __init__(self):
+        self.decimal_comma: Optional[bool] = None
+        self.ambiguous = 0
+        self._example = None
+
+    def feed(self, values: Iterable) -> Optional[bool]:
+        for v in values:
+            vote = decimal_vote(v)
+            if vote is None:
+                continue
+            if vote == "ambiguous":
+                self.ambiguous += 1
+                continue
+            comma = vote == "comma"
+            if self.decimal_comma is None:
+                self.decimal_comma, self._example = comma, v
+            elif comma != self.decimal_comma:
+                raise StatementError(
+                    f"El archivo mezcla separadores decimales en la columna de importe: "
+                    f"'{self._example}' y '{v}'."
+                )
+        return self.decimal_comma
+
+    def finish(self) -> bool:
+        """
+        Fin del archivo sin decisión: sin separadores da igual; si solo hubo
+        importes tipo "1,234" no se puede adivinar.
+        """
+        if self.decimal_comma is None and self.ambiguous:
+            raise StatementError(
+                "No pude detectar el separador decimal: los importes (ej. 1,234 / 1.234) "
+                "valen tanto con coma como con punto decimal. Usa un perfil con decimal_comma fijo."
+            )
+        return bool(self.decimal_comma)
+
+def header_columns(values) -> list:
+    """
+    Nombres de columna a partir de la fila de encabezados, con el mismo
+    criterio que pandas: vacías -> "Unnamed: i", repetidas -> "X.1", "X.2"...
+    """
+    cols, seen = [], {}
+    for i, v in enumerate(values):
+        name = f"Unnamed: {i}" if v is None or str(v).strip() == "" else str(v)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        cols.append(name)
+    return cols
+
+def clean_frame(df: pd.DataFrame, col_date, col_desc, col_amt, profile: BankProfile = AMEX,
+                decimal_comma: Optional[bool] = None) -> pd.DataFrame:
+    """
+    Limpia un bloque y lo deja con columnas __date__ / __desc__ / __amt__.
+    decimal_comma: el detectado para el archivo (None = el del perfil).
+    """
+    # Limpieza base
+    df = df.dropna(subset=[col_date, col_desc, col_amt])
+    out = pd.DataFrame(index=df.index)
+    out["__desc__"] = df[col_desc].astype(str).str.strip()
+
+    # Fecha robusta
+    if profile.dayfirst:
+        # dayfirst voltea también las ISO (2026-01-02 -> 1 feb): ISO primero
+        dates = pd.to_datetime(df[col_date], errors="coerce", format="ISO8601")
+        rest = dates.isna()
+        if rest.any():
+            dates[rest] = pd.to_datetime(df.loc[rest, col_date], errors="coerce", dayfirst=True)
+    else:
+        dates = pd.to_datetime(df[col_date], errors="coerce")
+    out["__date__"] = dates.dt.strftime("%Y-%m-%d")
+
+    # Monto robusto
+    if decimal_comma is None:
+        decimal_comma = bool(profile.decimal_comma)
+    out["__amt__"] = parse_amount_series(df[col_amt], decimal_comma=decimal_comma)
+    return out.loc[dates.notna() & out["__amt__"].notna()]
+
+def _chunks_from_rows(rows: Iterator[Sequence], chunk_rows: int, max_header_rows: int, profile: BankProfile):
+    """
+    rows: iterador de filas crudas (tuplas). Detecta el header mientras itera
+    y produce (hdr, df) por bloques ya limpios (ver clean_frame).
+    """
+    hdr = None
+    for i, values in enumerate(islice(rows, max_header_rows)):
+        if is_header_row(values, profile):
+            hdr = i
+            break
+    if hdr is None:
+        raise StatementError(
+            "No pude detectar la fila de encabezados (Fecha/Descripción/Importe).\n"
+            "Tip: dime qué fila ves en Excel donde empieza la tabla."
+        )
+
+    columns = header_columns(values)
+    probe = pd.DataFrame(columns=columns)
+    col_date = find_col(probe, profile.date_keys)
+    col_desc = find_col(probe, profile.desc_keys)
+    col_amt  = find_col(probe, profile.amt_keys)
+
+    if not (col_date and col_desc and col_amt):
+        raise StatementError(
+            f"Detecté header row: {hdr}\n"
+            "No encontré columnas necesarias. Detecté:\n"
+            f"Fecha: {col_date} Descripción: {col_desc} Importe/Monto: {col_amt}\n"
+            f"Columnas disponibles: {columns}"
+        )
+
+    # perfil sin decimal_comma fijo: los bloques esperan (crudos) hasta que
+    # un importe resuelva el separador
+    detector = DecimalDetector() if profile.decimal_comma is None else None
+    pending: List[pd.DataFrame] = []
+
+    # solo materializamos las 3 columnas que usamos
+    idx = [columns.index(c) for c in (col_date, col_desc, col_amt)]
+    while True:
+        block = list(islice(rows, chunk_rows))
+        if not block:
+            break
+        data = [
+            [(r[j] if j < len(r) else None) for j in idx]
+            for r in block
+        ]
+        df = pd.DataFrame(data, columns=[col_date, col_desc, col_amt])
+        decimal_comma = None
+        if detector is not None:
+            decimal_comma = detector.feed(df[col_amt])
+            if decimal_comma is None:
+                pending.append(df)
+                continue
+        for df in pending + [df]:
+            chunk = clean_frame(df, col_date, col_desc, col_amt, profile, decimal_comma)
+            if len(chunk):
+                yield hdr, chunk
+        pending = []
+
+    if pending:
+        decimal_comma = detector.finish()
+        for df in pending:
+            chunk = clean_frame(df, col_date, col_desc, col_amt, profile, decimal_comma)
+            if len(chunk):
+                yield hdr, chunk
+
+def read_statement_chunks(path: str, chunk_rows: int = READ_CHUNK_ROWS, max_header_rows: int = 60,
+                          profile: BankProfile = AMEX):
+    """
+    Lee la primera hoja del xlsx UNA sola vez, en streaming (openpyxl read-only).
+    Memoria constante: solo un bloque vive a la vez.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()  # algunos exports declaran mal el rango usado
+        yield from _chunks_from_rows(ws.iter_rows(values_only=True), chunk_rows, max_header_rows, profile)
+    finally:
+        wb.close()
+
+def read_csv_chunks(path: str, chunk_rows: int = READ_CHUNK_ROWS, max_header_rows: int = 60,
+                    profile: BankProfile = GENERIC_CSV):
+    """
+    Igual que read_statement_chunks pero para CSV (otros bancos).
+    Acepta UTF-8 (con o sin BOM) y, si no, Latin-1; separador autodetectado.
+    """
+    encoding = "utf-8-sig"
+    try:
+        with open(path, "r", encoding=encoding) as f:
+            f.read(1 << 16)
+    except UnicodeDecodeError:
+        encoding = "latin-1"
+
+    with open(path, "r", encoding=encoding, newline="") as f:
+        sample = f.read(1 << 14)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        rows = (tuple(r) for r in csv.reader(f, dialect))
+        yield from _chunks_from_rows(rows, chunk_rows, max_header_rows, profile)
+
+def read_statement(path: str, filename: Optional[str] = None, chunk_rows: int = READ_CHUNK_ROWS,
+                   profile: Optional[BankProfile] = None):
+    """
+    Elige lector por extensión (de filename si viene, si no de path) y perfil
+    (el indicado o el primero registrado para esa extensión).
+    """
+    filename = filename or path
+    profile = profile or get_profile(filename=filename)
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return read_statement_chunks(path, chunk_rows=chunk_rows, profile=profile)
+    if ext == ".csv":
+        return read_csv_chunks(path, chunk_rows=chunk_rows, profile=profile)
+    raise StatementError(f"Formato no soportado: {ext or '(sin extensión)'} (usa .xlsx o .csv)")
+
+def build_items(df: pd.DataFrame, col_desc="__desc__", source: str = "import", sign: int = -1) -> list:
+    """
+    df ya limpio (columnas __date__ y __amt__, ver clean_frame). Todo con operaciones de columna.
+
+    Convención:
+    - gasto = negativo
+    - ingreso = positivo
+
+    Regla AMEX típica:
+    - cargos vienen como positivos -> gasto
+    - abonos / devoluciones vienen como negativos -> ingreso
+    => amount = -importe (sign=-1, default). Otros bancos: ver BankProfile.sign
+    """
+    amount = (sign * df["__amt__"].astype(float)).round(2) + 0.0  # + 0.0 evita -0.0
+
+    # tolist() por columna + zip: ~7x más rápido que to_dict("records")
+    return [
+        {"date": d, "description": desc, "amount": a, "source": source}
+        for d, desc, a in zip(
+            df["__date__"].tolist(),
+            df[col_desc].astype(str).tolist(),
+            amount.tolist(),
+        )
+    ]
+
+def iter_items(path: str, filename: Optional[str] = None, profile: Optional[BankProfile] = None,
+               chunk_rows: int = READ_CHUNK_ROWS, source: str = "import") -> Iterator[List[dict]]:
+    """
+    Items listos para la API, por bloques, con el signo del perfil aplicado.
+    """
+    profile = profile or get_profile(filename=filename or path)
+    for _hdr, chunk in read_statement(path, filename, chunk_rows=chunk_rows, profile=profile):
+        yield build_items(chunk, source=source, sign=profile.sign)
+
+def parse_file(path: str, profile_name: Optional[str] = None) -> List[dict]:
+    """
+    Un archivo completo -> items. Función de módulo para poder usarla en un
+    pool de procesos.
+    """
+    profile = get_profile(profile_name, filename=path)
+    items = []
+    for block in iter_items(path, profile=profile):
+        items.extend(block)
+    return items
+
+def merge_items(batches: Iterable[List[dict]]) -> List[dict]:
+    """
+    Une varios archivos en un solo flujo ordenado por fecha.
+    Deduplica traslapes entre archivos (dos estados que cubren el mismo
+    periodo) sin perder repetidos legítimos dentro de un archivo: por cada
+    (fecha, descripción, monto) se queda con el máximo de veces que aparece
+    en un solo archivo, no con la suma.
+    """
+    keep: Counter = Counter()
+    first: Dict[tuple, dict] = {}
+    for items in batches:
+        counts = Counter()
+        for it in items:
+            key = (it["date"], it["description"], it["amount"])
+            counts[key] += 1
+            first.setdefault(key, it)
+        for key, n in counts.items():
+            if n > keep[key]:
+                keep[key] = n
+
+    merged = []
+    for key in sorted(keep):
+        merged.extend(dict(first[key]) for _ in range(keep[key]))
+    return merged
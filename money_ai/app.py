@@ -1,62 +1,141 @@
-from fastapi import FastAPI, Depends, HTTPException
+import os
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+
+import numpy as np
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, UploadFile, File
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from core.database import Base, engine
+from core.database import engines, writer_engines
 from core.deps import get_db, get_current_user
-from core.models import User, Record, RecurringRule, UserRule
+from core.migrations import check_schema, migrate
+from core.ingest import insert_records, load_user_rules
+from core.jobs import (
+    ImportSizeLimit, JobQueueFull, UploadTooLarge,
+    create_job, discard_upload, fail_interrupted_jobs, job_out, release_slot, reserve_slot, save_upload, submit_import, submit_records,
+)
+from core.models import User, Record, RecurringRule, UserRule, Job
 from core.schemas import (
     RegisterIn, LoginIn, TokenOut,
     RecordIn, RecordOut,
     RecurringIn, RecurringOut,
     RuleIn, RuleOut,
-    RecordPatch
+    RecordPatch,
+    JobOut,
+    SyncOut,
+)
+from core.txcache import BAD_DAY, get_frame, parse_days, txcache
+from core.stats import month_alerts
+from core.forecast import forecast_user
+from core.search import search_records
+from core.export import FORMATS, ExportError, check_format, export_stream
+from core.sync import changes_since
+from core.security import hash_password, verify_password, create_token, hash_pool_stats, shutdown_pool, HashPoolBusy
+from core.writer import run_write, write_queue_stats
+from core import metrics
+from core.querybudget import QUERY_DEBUG, QueryDebugMiddleware, query_budget
+from core.profiling import PROFILING, ProfileMiddleware, ProfiledRoute
+
+from ai.rules import normalize_contains
+from ai.recurring import covered, description_key, discover
+from ai.finance import (
+    build_summary, build_summary_columns, build_trends, explain, month_index, Transaction,
 )
-from core.security import hash_password, verify_password, create_token
-
-from ai.rules import classify, normalize_contains
-from ai.finance import build_summary, explain, Transaction
-
-app = FastAPI(title="Money AI")
 
-# MVP: crea tablas al arrancar
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_pool()  # procesos de bcrypt (core/security.py)
+
+app = FastAPI(title="Money AI", lifespan=lifespan)
+
+# Profiling por request (core/profiling.py): solo si PROFILE_TOKEN o PROFILE_SAMPLE_RATE
+if PROFILING:
+    app.router.route_class = ProfiledRoute  # antes de declarar las rutas
+
+# Esquema versionado (core/migrations.py): `python migrate.py` corre una vez
+# antes de los workers; aquí solo se verifica la versión (un SELECT).
+# MIGRATE_ON_STARTUP=1 migra al arrancar (dev, un solo proceso).
+# Con SHARD_COUNT, directorio + cada shard.
+if os.getenv("MIGRATE_ON_STARTUP", "0") == "1":
+    for e in writer_engines:
+        migrate(e)
+        fail_interrupted_jobs(e)
+else:
+    for e in engines:
+        check_schema(e)
+
+# Métricas (core/metrics.py): latencia / tamaños / errores por ruta y queries por request
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+if QUERY_DEBUG:
+    app.add_middleware(QueryDebugMiddleware)  # va por dentro del de métricas
+if PROFILING:
+    app.add_middleware(ProfileMiddleware)
+app.add_middleware(ImportSizeLimit)  # 413 por Content-Length antes de leer el upload
+app.add_middleware(metrics.MetricsMiddleware)
+for e in engines + writer_engines:
+    metrics.instrument_engine(e)
+metrics.register_collector("hash_pool", hash_pool_stats)
+metrics.register_collector("txcache", txcache.stats)
+metrics.register_collector("write_queue", write_queue_stats)
+
+@app.exception_handler(HashPoolBusy)
+def hash_pool_busy(request: Request, exc: HashPoolBusy):
+    # ráfaga de login/registro: rechazo rápido en vez de encolar sin límite
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(JobQueueFull)
+def job_queue_full(request: Request, exc: JobQueueFull):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
 
 # -------------------------
 # Auth
 # -------------------------
 @app.post("/auth/register", response_model=TokenOut)
-def register(body: RegisterIn, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == body.email.lower()).first()
+async def register(body: RegisterIn, db: Session = Depends(get_db)):
+    # async: el hash se espera en el event loop; solo la DB pasa por el threadpool
+    existing = await run_in_threadpool(
+        lambda: db.query(User.id).filter(User.email == body.email.lower()).first()
+    )
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     try:
-        pw_hash = hash_password(body.password)
+        pw_hash = await hash_password(body.password)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    user = User(email=body.email.lower(), password_hash=pw_hash)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    def work(s: Session) -> int:
+        user = User(email=body.email.lower(), password_hash=pw_hash)
+        s.add(user)
+        s.flush()
+        return user.id
 
-    token = create_token(user.id)
+    user_id = await run_in_threadpool(run_write, db, work)
+    token = create_token(user_id)
     return TokenOut(access_token=token)
 
 @app.post("/auth/login", response_model=TokenOut)
-def login(body: LoginIn, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == body.email.lower(), User.is_active == True).first()
-    if not user or not verify_password(body.password, user.password_hash):
+async def login(body: LoginIn, db: Session = Depends(get_db)):
+    row = await run_in_threadpool(
+        lambda: db.query(User.id, User.password_hash)
+        .filter(User.email == body.email.lower(), User.is_active == True).first()
+    )
+    if not row or not await verify_password(body.password, row.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = create_token(user.id)
+    token = create_token(row.id)
     return TokenOut(access_token=token)
 
 # -------------------------
 # Rules (Aprendizaje por usuario)
 # -------------------------
 @app.get("/rules", response_model=List[RuleOut])
+@query_budget(2)
 def list_rules(
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -76,22 +155,25 @@ def create_rule(
     if not contains:
         raise HTTPException(status_code=400, detail="contains vacío")
 
-    existing = db.query(UserRule).filter(
-        UserRule.user_id == user.id,
-        UserRule.contains == contains
-    ).first()
+    user_id = user.id
 
-    if existing:
-        existing.category = category
-        db.commit()
-        db.refresh(existing)
-        return RuleOut(id=existing.id, contains=existing.contains, category=existing.category)
+    def work(s: Session) -> RuleOut:
+        existing = s.query(UserRule).filter(
+            UserRule.user_id == user_id,
+            UserRule.contains == contains
+        ).first()
+
+        if existing:
+            existing.category = category
+            s.flush()
+            return RuleOut(id=existing.id, contains=existing.contains, category=existing.category)
+
+        rule = UserRule(user_id=user_id, contains=contains, category=category)
+        s.add(rule)
+        s.flush()
+        return RuleOut(id=rule.id, contains=rule.contains, category=rule.category)
 
-    rule = UserRule(user_id=user.id, contains=contains, category=category)
-    db.add(rule)
-    db.commit()
-    db.refresh(rule)
-    return RuleOut(id=rule.id, contains=rule.contains, category=rule.category)
+    return run_write(db, work)
 
 # -------------------------
 # Records
@@ -99,30 +181,53 @@ def create_rule(
 @app.post("/records", response_model=dict)
 def add_records(
     items: List[RecordIn],
+    mode: str = "sync",
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    # carga reglas del usuario
-    rules = db.query(UserRule).filter(UserRule.user_id == user.id).all()
-    user_rules = [(r.contains, r.category) for r in rules]
-
-    for item in items:
-        category, confidence = classify(item.description, item.amount, user_rules=user_rules)
-        rec = Record(
-            user_id=user.id,
-            date=item.date,
-            description=item.description,
-            amount=item.amount,
-            category=category,
-            confidence=confidence,
-            source=item.source or "manual",
-        )
-        db.add(rec)
-
-    db.commit()
-    return {"ok": True, "added": len(items)}
+    user_id = user.id
+
+    rows = [item.model_dump() for item in items]
+
+    # mode=async: valida, encola y responde 202 de inmediato; ver /jobs/{id}
+    if mode == "async":
+        reserve_slot()
+        try:
+            job = create_job(db, user_id, "records", total=len(rows))
+        except BaseException:
+            release_slot()
+            raise
+        submit_records(job.id, user_id, rows)
+        return JSONResponse(status_code=202, content=job.model_dump())
+    if mode != "sync":
+        raise HTTPException(status_code=400, detail="mode debe ser 'sync' o 'async'")
+
+    def work(s: Session) -> dict:
+        # carga reglas del usuario
+        user_rules = load_user_rules(s, user_id)
+        added = insert_records(s, user_id, rows, user_rules)
+        return {"ok": True, "added": added}
+
+    return run_write(db, work)
+
+# va antes de /records/{month} para que "search" no se tome como mes
+@app.get("/records/search", response_model=dict)
+@query_budget(3)
+def search(
+    q: str,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    try:
+        total, items = search_records(db, user.id, q, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"q": q, "total": total, "limit": limit, "offset": offset, "items": items}
 
 @app.get("/records/{month}", response_model=List[RecordOut])
+@query_budget(2)
 def list_records(
     month: str,
     kind: str = "all",
@@ -160,30 +265,34 @@ def patch_record(
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    r = db.query(Record).filter(Record.id == record_id, Record.user_id == user.id).first()
-    if not r:
-        raise HTTPException(status_code=404, detail="Record not found")
+    user_id = user.id
 
-    if body.category:
-        new_cat = body.category.strip()
-        r.category = new_cat
-        r.confidence = 1.0  # corregido
+    def work(s: Session) -> dict:
+        r = s.query(Record).filter(Record.id == record_id, Record.user_id == user_id).first()
+        if not r:
+            raise HTTPException(status_code=404, detail="Record not found")
 
-        # aprender: regla por usuario (MVP)
-        contains = normalize_contains(r.description)
+        if body.category:
+            new_cat = body.category.strip()
+            r.category = new_cat
+            r.confidence = 1.0  # corregido
 
-        existing = db.query(UserRule).filter(
-            UserRule.user_id == user.id,
-            UserRule.contains == contains
-        ).first()
+            # aprender: regla por usuario (MVP)
+            contains = normalize_contains(r.description)
 
-        if existing:
-            existing.category = new_cat
-        else:
-            db.add(UserRule(user_id=user.id, contains=contains, category=new_cat))
+            existing = s.query(UserRule).filter(
+                UserRule.user_id == user_id,
+                UserRule.contains == contains
+            ).first()
 
-    db.commit()
-    return {"ok": True, "record_id": r.id, "category": r.category}
+            if existing:
+                existing.category = new_cat
+            else:
+                s.add(UserRule(user_id=user_id, contains=contains, category=new_cat))
+
+        return {"ok": True, "record_id": r.id, "category": r.category}
+
+    return run_write(db, work)
 
 @app.delete("/records/{record_id}", response_model=dict)
 def delete_record(
@@ -191,17 +300,118 @@ def delete_record(
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    r = db.query(Record).filter(
-        Record.id == record_id,
-        Record.user_id == user.id
-    ).first()
+    user_id = user.id
+
+    def work(s: Session) -> dict:
+        r = s.query(Record).filter(
+            Record.id == record_id,
+            Record.user_id == user_id
+        ).first()
+
+        if not r:
+            raise HTTPException(status_code=404, detail="Record not found")
+
+        s.delete(r)
+        return {"ok": True, "deleted": record_id}
+
+    return run_write(db, work)
+
+# -------------------------
+# Export (CSV / NDJSON / Parquet, en streaming)
+# -------------------------
+@app.get("/export")
+def export_records(
+    start: Optional[str] = None,  # "YYYY-MM-DD" inclusive
+    end: Optional[str] = None,    # "YYYY-MM-DD" inclusive
+    format: str = "csv",          # csv | ndjson | parquet
+    gzip: bool = False,
+    user: User = Depends(get_current_user),
+):
+    try:
+        check_format(format)
+        start_d = date.fromisoformat(start) if start else None
+        end_d = date.fromisoformat(end) if end else None
+    except (ExportError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type, ext = FORMATS[format]
+    filename = f"records.{ext}"
+    if gzip:
+        media_type, filename = "application/gzip", filename + ".gz"
+
+    stream = export_stream(
+        user.id,
+        start_d.isoformat() if start_d else None,
+        (end_d + timedelta(days=1)).isoformat() if end_d else None,
+        format,
+        gzip,
+    )
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-    if not r:
-        raise HTTPException(status_code=404, detail="Record not found")
+# -------------------------
+# Imports (estado de cuenta completo, se procesa en el server)
+# -------------------------
+IMPORT_EXTENSIONS = {".xlsx", ".xlsm", ".csv"}
 
-    db.delete(r)
-    db.commit()
-    return {"ok": True, "deleted": record_id}
+@app.post("/imports", response_model=JobOut, status_code=202)
+def create_import(
+    file: UploadFile = File(...),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    filename = os.path.basename(file.filename or "")
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in IMPORT_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Formato no soportado (usa .xlsx o .csv)")
+
+    reserve_slot()
+    try:
+        path = save_upload(file.file, filename)
+    except UploadTooLarge as e:
+        release_slot()
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        release_slot()
+        raise
+
+    # de aquí en adelante el archivo es del job; si no llega a encolarse, se borra
+    try:
+        job = create_job(db, user.id, "import", filename=filename)
+        submit_import(job.id, user.id, path, filename)
+    except BaseException:
+        discard_upload(path)
+        release_slot()
+        raise
+    return job
+
+@app.get("/imports/{job_id}", response_model=JobOut)
+def get_import(
+    job_id: int,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    job = db.query(Job).filter(Job.id == job_id, Job.user_id == user.id, Job.kind == "import").first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job_out(job)
+
+# -------------------------
+# Jobs (imports y ingest async)
+# -------------------------
+@app.get("/jobs/{job_id}", response_model=JobOut)
+def get_job(
+    job_id: int,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    job = db.query(Job).filter(Job.id == job_id, Job.user_id == user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_out(job)
 
 # -------------------------
 # Recurring
@@ -215,30 +425,35 @@ def create_recurring(
     if body.schedule != "monthly":
         raise HTTPException(status_code=400, detail="Fase 1 solo soporta schedule='monthly'")
 
-    rule = RecurringRule(
-        user_id=user.id,
-        name=body.name.strip(),
-        amount=body.amount,
-        category=body.category.strip(),
-        schedule="monthly",
-        day_of_month=int(body.day_of_month),
-        active=bool(body.active),
-    )
-    db.add(rule)
-    db.commit()
-    db.refresh(rule)
-
-    return RecurringOut(
-        id=rule.id,
-        name=rule.name,
-        amount=rule.amount,
-        category=rule.category,
-        schedule=rule.schedule,
-        day_of_month=rule.day_of_month,
-        active=rule.active,
-    )
+    user_id = user.id
+
+    def work(s: Session) -> RecurringOut:
+        rule = RecurringRule(
+            user_id=user_id,
+            name=body.name.strip(),
+            amount=body.amount,
+            category=body.category.strip(),
+            schedule="monthly",
+            day_of_month=int(body.day_of_month),
+            active=bool(body.active),
+        )
+        s.add(rule)
+        s.flush()
+
+        return RecurringOut(
+            id=rule.id,
+            name=rule.name,
+            amount=rule.amount,
+            category=rule.category,
+            schedule=rule.schedule,
+            day_of_month=rule.day_of_month,
+            active=rule.active,
+        )
+
+    return run_write(db, work)
 
 @app.get("/recurring", response_model=List[RecurringOut])
+@query_budget(2)
 def list_recurring(
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -260,59 +475,110 @@ def list_recurring(
         for r in rules
     ]
 
+@app.get("/recurring/suggestions", response_model=List[dict])
+@query_budget(4)
+def recurring_suggestions(
+    min_confidence: float = Query(0.5, ge=0, le=1),
+    limit: int = Query(20, ge=1, le=100),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # historial sin lo que ya generan las reglas existentes
+    rows = db.query(Record.date, Record.description, Record.amount, Record.category).filter(
+        Record.user_id == user.id,
+        Record.source != "recurring",
+    ).yield_per(5000)
+
+    dates, descriptions, amounts, categories = [], [], [], []
+    for r in rows:
+        dates.append(r.date)
+        descriptions.append(r.description)
+        amounts.append(r.amount)
+        categories.append(r.category)
+
+    days = parse_days(dates)
+    ok = days != BAD_DAY
+    candidates = discover(
+        days[ok],
+        [d for d, k in zip(descriptions, ok) if k],
+        np.asarray(amounts, dtype=np.float64)[ok],
+        [c for c, k in zip(categories, ok) if k],
+        today=int(np.datetime64(date.today(), "D").astype(np.int64)),
+    )
+
+    # fuera lo que ya tiene regla (mismo nombre normalizado y monto parecido)
+    rules = db.query(RecurringRule).filter(RecurringRule.user_id == user.id).all()
+    existing = [(description_key(r.name), r.amount) for r in rules]
+    return [c for c in candidates if c["confidence"] >= min_confidence and not covered(c, existing)][:limit]
+
 @app.post("/recurring/generate/{month}", response_model=dict)
 def generate_recurring_for_month(
     month: str,  # "YYYY-MM"
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    rules = db.query(RecurringRule).filter(
-        RecurringRule.user_id == user.id,
-        RecurringRule.active == True,
-        RecurringRule.schedule == "monthly"
-    ).all()
-
-    created = 0
-    for rule in rules:
-        dd = max(1, min(28, int(rule.day_of_month)))
-        date = f"{month}-{dd:02d}"
-        description = f"[REC] {rule.name}"
-
-        exists = db.query(Record).filter(
-            Record.user_id == user.id,
-            Record.date == date,
-            Record.description == description,
-            Record.amount == rule.amount,
+    user_id = user.id
+
+    def work(s: Session) -> dict:
+        rules = s.query(RecurringRule).filter(
+            RecurringRule.user_id == user_id,
+            RecurringRule.active == True,
+            RecurringRule.schedule == "monthly"
+        ).all()
+
+        # una sola query para los recurrentes ya generados en el mes (días 1..28)
+        existing = set(s.query(Record.date, Record.description, Record.amount).filter(
+            Record.user_id == user_id,
+            Record.date >= f"{month}-01",
+            Record.date <= f"{month}-28",
             Record.source == "recurring",
-        ).first()
+        ).all())
 
-        if exists:
-            continue
+        created = 0
+        for rule in rules:
+            dd = max(1, min(28, int(rule.day_of_month)))
+            date = f"{month}-{dd:02d}"
+            description = f"[REC] {rule.name}"
 
-        rec = Record(
-            user_id=user.id,
-            date=date,
-            description=description,
-            amount=rule.amount,
-            category=rule.category,
-            confidence=1.0,
-            source="recurring",
-        )
-        db.add(rec)
-        created += 1
+            if (date, description, rule.amount) in existing:
+                continue
 
-    db.commit()
-    return {"ok": True, "created": created, "month": month}
+            rec = Record(
+                user_id=user_id,
+                date=date,
+                description=description,
+                amount=rule.amount,
+                category=rule.category,
+                confidence=1.0,
+                source="recurring",
+            )
+            s.add(rec)
+            created += 1
+
+        return {"ok": True, "created": created, "month": month}
+
+    return run_write(db, work)
 
 # -------------------------
 # Report
 # -------------------------
 @app.get("/report/{month}", response_model=dict)
+@query_budget(4)
 def report(
     month: str,
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    # camino rápido: historial en columnas (core/txcache.py)
+    frame = get_frame(db, user.id)
+    mask = frame.month(month)
+    if mask is not None:
+        summary = build_summary_columns(frame.amounts[mask], frame.cats[mask], frame.categories, month)
+        summary["alerts"] = month_alerts(db, user.id, frame, mask, month)
+        summary["message"] = explain(summary)
+        return summary
+
+    # mes no estándar o fechas no ISO: filtro por prefijo en la DB
     rows = db.query(Record).filter(
         Record.user_id == user.id,
         Record.date.startswith(month)
@@ -330,5 +596,80 @@ def report(
     ]
 
     summary = build_summary(txs, month)
+    summary["alerts"] = []  # las alertas necesitan un mes YYYY-MM y fechas ISO
     summary["message"] = explain(summary)
     return summary
+
+# -------------------------
+# Trends
+# -------------------------
+TRENDS_MAX_MONTHS = 120
+
+@app.get("/trends", response_model=dict)
+@query_budget(3)
+def trends(
+    start: Optional[str] = None,  # "YYYY-MM"
+    end: Optional[str] = None,    # "YYYY-MM" (default: mes actual)
+    kind: str = "expense",        # expense | income
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    if kind not in ("expense", "income"):
+        raise HTTPException(status_code=400, detail="kind debe ser 'expense' o 'income'")
+    try:
+        end_idx = month_index(end or date.today().strftime("%Y-%m"))
+        start_idx = month_index(start) if start else end_idx - 11
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if start_idx > end_idx:
+        raise HTTPException(status_code=400, detail="start debe ser <= end")
+    if end_idx - start_idx + 1 > TRENDS_MAX_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Máximo {TRENDS_MAX_MONTHS} meses")
+
+    frame = get_frame(db, user.id)
+    ok = frame.days != BAD_DAY  # fechas no ISO no caen en ningún mes
+    return build_trends(
+        frame.days[ok], frame.amounts[ok], frame.cats[ok], frame.categories,
+        start_idx, end_idx, kind,
+    )
+
+# -------------------------
+# Forecast
+# -------------------------
+@app.get("/forecast/{month}", response_model=dict)
+@query_budget(4)
+def forecast(
+    month: str,                   # "YYYY-MM"
+    as_of: Optional[str] = None,  # "YYYY-MM-DD" (default: hoy)
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    try:
+        cutoff = date.fromisoformat(as_of) if as_of else None
+        return forecast_user(db, user.id, month, cutoff)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# -------------------------
+# Sync (cambios desde una versión)
+# -------------------------
+@app.get("/sync", response_model=SyncOut)
+@query_budget(6)
+def sync(
+    since: int = Query(0, ge=0),
+    # límite suave: se completa el último change_seq (ver core/sync.py)
+    limit: int = Query(1000, ge=1, le=10000, description="Filas aproximadas por página; el último cambio llega completo"),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return changes_since(db, user.id, since, limit)
+
+# -------------------------
+# Métricas
+# -------------------------
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics(request: Request):
+    # METRICS_TOKEN vacío = abierto (el puerto de métricas no debería ser público)
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,351 @@
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bench import synth
+
+# =========================
+# Prueba de carga
+# =========================
+# Desde money_ai/:
+#   python -m bench.load                                   # levanta uvicorn con una DB temporal
+#   python -m bench.load --users 50 --concurrency 32 --duration 120
+#   python -m bench.load --rate 200 --workers 4 --out load.json
+#   python -m bench.load --url http://127.0.0.1:8000       # contra una instancia ya levantada
+#
+# Mezcla de operaciones (--mix, pesos): listar mes, reporte, patch de categoría,
+# ingest de 200 filas, alta de regla, login y, de vez en cuando, un ingest de
+# 10k filas en modo async (se espera el job con /jobs/{id}).
+# Sin --rate: lazo cerrado, `concurrency` hilos sin pausa. Con --rate: llegadas
+# de Poisson a R req/s y la latencia se mide desde la llegada programada, así
+# la espera por un hilo libre cuenta (sin omisión coordinada).
+
+DEFAULT_MIX = "list_month=30,report=30,patch=15,ingest_200=10,rule=5,login=5,ingest_10k=1"
+JOB_POLL_S = 0.5
+JOB_TIMEOUT_S = 600
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+
+    def add(self, route: str, seconds: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if error:
+                by_kind = self.errors.setdefault(route, {})
+                by_kind[error] = by_kind.get(error, 0) + 1
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Percentil por rango más cercano; values debe venir ordenado.
+    """
+    if not values:
+        return 0.0
+    k = math.ceil(p / 100.0 * len(values)) - 1
+    return values[max(0, min(len(values) - 1, k))]
+
+
+class Client:
+    """
+    Un usuario virtual: sesión HTTP con keep-alive y su propio token.
+    Los hilos comparten usuarios: las listas se reemplazan enteras, no se mutan.
+    """
+
+    def __init__(self, base_url: str, recorder: Recorder, pool: int):
+        self.base = base_url.rstrip("/")
+        self.rec = recorder
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        self.password = "load-password"
+        self.headers: Dict[str, str] = {}
+        self.months: List[str] = []
+        self.record_ids: List[int] = []
+
+    def call(self, route: str, method: str, path: str, t0: Optional[float] = None,
+             expect=(200,), **kwargs) -> Optional[requests.Response]:
+        start = time.perf_counter() if t0 is None else t0
+        error = None
+        r = None
+        try:
+            r = self.session.request(method, self.base + path, headers=self.headers, timeout=120, **kwargs)
+            if r.status_code not in expect:
+                error = str(r.status_code)
+        except requests.RequestException as e:
+            error = type(e).__name__
+        self.rec.add(route, time.perf_counter() - start, error)
+        return r if error is None else None
+
+    # ----- operaciones -----
+    def register(self, t0=None) -> None:
+        r = self.call("POST /auth/register", "POST", "/auth/register", t0,
+                      json={"email": self.email, "password": self.password})
+        if r is not None:
+            self.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    def login(self, t0=None) -> None:
+        r = self.call("POST /auth/login", "POST", "/auth/login", t0,
+                      json={"email": self.email, "password": self.password})
+        if r is not None:
+            self.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    def ingest(self, n: int, t0=None) -> None:
+        items = synth.make_records(n, seed=random.randrange(1 << 30))
+        months = sorted({it["date"][:7] for it in items})
+        if n <= 1000:
+            if self.call(f"POST /records ({n})", "POST", "/records", t0, json=items) is not None:
+                self.months = sorted(set(self.months) | set(months))
+            return
+
+        r = self.call(f"POST /records?mode=async ({n})", "POST", "/records", t0,
+                      params={"mode": "async"}, json=items, expect=(202,))
+        if r is None:
+            return
+        job_id = r.json()["id"]
+        started = time.perf_counter()
+        while time.perf_counter() - started < JOB_TIMEOUT_S:
+            time.sleep(JOB_POLL_S)
+            j = self.call("GET /jobs/{id}", "GET", f"/jobs/{job_id}")
+            if j is None:
+                continue
+            status = j.json()["status"]
+            if status in ("done", "failed"):
+                self.rec.add(f"job records ({n})", time.perf_counter() - started,
+                             None if status == "done" else "failed")
+                self.months = sorted(set(self.months) | set(months))
+                return
+        self.rec.add(f"job records ({n})", time.perf_counter() - started, "timeout")
+
+    def list_month(self, t0=None) -> None:
+        month = random.choice(self.months or ["2026-06"])
+        r = self.call("GET /records/{month}", "GET", f"/records/{month}", t0)
+        if r is not None:
+            ids = [it["id"] for it in r.json()]
+            if ids:
+                self.record_ids = random.sample(ids, min(50, len(ids)))
+
+    def report(self, t0=None) -> None:
+        month = random.choice(self.months or ["2026-06"])
+        self.call("GET /report/{month}", "GET", f"/report/{month}", t0)
+
+    def patch(self, t0=None) -> None:
+        if not self.record_ids:
+            return self.list_month(t0)
+        record_id = random.choice(self.record_ids)
+        self.call("PATCH /records/{id}", "PATCH", f"/records/{record_id}", t0,
+                  json={"category": random.choice(["Super", "Transporte", "Comercio", "Otros"])},
+                  expect=(200, 404))
+
+    def rule(self, t0=None) -> None:
+        contains, category = random.choice(synth.USER_RULES)
+        self.call("POST /rules", "POST", "/rules", t0, json={"contains": contains, "category": category})
+
+
+OPS: Dict[str, Callable[[Client, Optional[float]], None]] = {
+    "list_month": Client.list_month,
+    "report": Client.report,
+    "patch": Client.patch,
+    "ingest_200": lambda c, t0=None: c.ingest(200, t0),
+    "ingest_10k": lambda c, t0=None: c.ingest(10000, t0),
+    "rule": Client.rule,
+    "login": Client.login,
+}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPS:
+            raise SystemExit(f"Operación desconocida en --mix: {name} (usa {', '.join(OPS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# -------------------------
+# Servidor local
+# -------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path: str, workers: int) -> Tuple[subprocess.Popen, str]:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", MIGRATE_ON_STARTUP="0",
+               SHARD_URL=f"sqlite:///{os.path.splitext(db_path)[0]}-shard{{shard}}.db")
+    subprocess.run([sys.executable, "migrate.py"], env=env, check=True, stdout=subprocess.DEVNULL)
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn terminó con código {proc.returncode}")
+        try:
+            if requests.get(url + "/openapi.json", timeout=1).status_code == 200:
+                return proc, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("uvicorn no respondió en 60 s")
+
+
+# -------------------------
+# Carga
+# -------------------------
+def run(url: str, users: int, concurrency: int, duration: float, rate: float,
+        mix: Dict[str, float], seed: Optional[int] = None) -> dict:
+    if seed is not None:
+        random.seed(seed)
+    rec = Recorder()
+    clients = [Client(url, rec, concurrency) for _ in range(users)]
+
+    # alta + ~2 meses de datos por usuario (fuera de las métricas de la corrida)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda c: (c.register(), c.ingest(200)), clients))
+    clients = [c for c in clients if c.headers]
+    if not clients:
+        raise SystemExit("No se pudo registrar ningún usuario")
+
+    names = list(mix)
+    weights = [mix[n] for n in names]
+
+    def one(t0: Optional[float] = None) -> None:
+        op = random.choices(names, weights)[0]
+        OPS[op](random.choice(clients), t0)
+
+    setup = {route: len(v) for route, v in rec.latencies.items()}
+    rec.latencies.clear()
+    rec.errors.clear()
+
+    started = time.perf_counter()
+    deadline = started + duration
+    if rate > 0:
+        # lazo abierto: la latencia empieza en la llegada programada
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            t = started
+            while True:
+                t += random.expovariate(rate)
+                if t >= deadline:
+                    break
+                delay = t - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(one, t)
+    else:
+        def loop():
+            while time.perf_counter() < deadline:
+                one()
+
+        threads = [threading.Thread(target=loop, daemon=True) for _ in range(concurrency)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for route, values in sorted(rec.latencies.items()):
+        values.sort()
+        errors = rec.errors.get(route, {})
+        routes[route] = {
+            "count": len(values),
+            "errors": sum(errors.values()),
+            "errors_by_kind": errors,
+            "throughput_per_s": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+    total = sum(r["count"] for r in routes.values())
+    return {
+        "config": {"users": len(clients), "concurrency": concurrency, "duration_s": duration,
+                   "rate_per_s": rate or None, "mix": mix, "setup_requests": setup},
+        "elapsed_s": elapsed,
+        "requests": total,
+        "errors": sum(r["errors"] for r in routes.values()),
+        "throughput_per_s": total / elapsed,
+        "routes": routes,
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"\n{result['requests']} requests en {result['elapsed_s']:.1f} s "
+          f"({result['throughput_per_s']:.1f} req/s), {result['errors']} errores")
+    print(f"{'ruta':<34}{'n':>7}{'err':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for route, r in result["routes"].items():
+        print(f"{route:<34}{r['count']:>7}{r['errors']:>6}{r['throughput_per_s']:>9.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+        if r["errors_by_kind"]:
+            print(f"{'':<34}errores: {r['errors_by_kind']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Prueba de carga de Money AI.")
+    ap.add_argument("--url", help="instancia existente; si falta se levanta uvicorn con una DB temporal")
+    ap.add_argument("--workers", type=int, default=1, help="workers de uvicorn (solo sin --url)")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=60, help="segundos de carga (sin contar el alta)")
+    ap.add_argument("--rate", type=float, default=0, help="llegadas por segundo; 0 = lazo cerrado")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="pesos op=peso separados por coma")
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--out", help="guarda resultados en JSON")
+    args = ap.parse_args()
+
+    mix = parse_mix(args.mix)
+    proc, tmp = None, None
+    url = args.url
+    if not url:
+        tmp = tempfile.mkdtemp(prefix="moneyai-load-")
+        proc, url = start_server(os.path.join(tmp, "load.db"), max(1, args.workers))
+
+    try:
+        result = run(url, max(1, args.users), max(1, args.concurrency), args.duration, args.rate, mix, args.seed)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    result["config"]["url"] = args.url or "local"
+    print_report(result)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResultados en {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
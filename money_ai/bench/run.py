@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+# =========================
+# Benchmarks
+# =========================
+# Desde money_ai/:
+#   python -m bench.run                               # 1k / 100k / 1M records
+#   python -m bench.run --sizes 1000,100000 --out bench.json
+#   python -m bench.run --sizes 1000 --compare bench.json
+#
+# Usa una DB temporal (DATABASE_URL) y el TestClient de FastAPI: mide el
+# costo del endpoint completo (auth, validación, DB, serialización), sin red.
+
+DEFAULT_SIZES = "1000,100000,1000000"
+
+
+def _setup_env(db_path: str) -> None:
+    # antes de importar app / core: el engine se crea al importar
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SHARD_URL"] = f"sqlite:///{os.path.splitext(db_path)[0]}-shard{{shard}}.db"  # si SHARD_COUNT
+    os.environ.setdefault("MIGRATE_ON_STARTUP", "1")
+    os.environ.setdefault("HASH_POOL_SIZE", "0")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def measure(fn: Callable[[], None], repeat: int, setup: Callable[[], None] = None) -> Dict[str, float]:
+    """
+    Corre fn `repeat` veces (setup antes de cada una, fuera del tiempo).
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return {
+        "repeat": repeat,
+        "min_s": times[0],
+        "median_s": statistics.median(times),
+        "p95_s": times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))],
+        "max_s": times[-1],
+    }
+
+
+def run(sizes: List[int], repeat: int, workdir: str) -> dict:
+    from fastapi.testclient import TestClient
+
+    import app as app_module
+    from ai import memory
+    from ai.finance import Transaction, build_summary
+    from ai.rules import classify
+    from bench import synth
+    from core.database import SessionLocal, bind_user, writer_engine_for
+    from core.models import Record
+    from core.txcache import txcache
+
+    client = TestClient(app_module.app)
+    results = []
+
+    def add(size: int, name: str, ops: int, stats: Dict[str, float]) -> None:
+        stats.update({"size": size, "name": name, "ops": ops, "ops_per_s": ops / stats["median_s"] if stats["median_s"] else None})
+        results.append(stats)
+        print(f"{size:>9}  {name:<28} median {stats['median_s'] * 1000:10.2f} ms  p95 {stats['p95_s'] * 1000:10.2f} ms")
+
+    # ----- funciones puras (no dependen del tamaño de la DB) -----
+    sample = synth.make_records(10000, seed=1)
+    rules = list(synth.USER_RULES)
+    add(0, "classify", len(sample), measure(
+        lambda: [classify(it["description"], it["amount"], user_rules=rules) for it in sample], repeat,
+    ))
+
+    memory.MEMORY_PATH = os.path.join(workdir, "memory.json")
+    mem = synth.make_memory(1000)
+    with open(memory.MEMORY_PATH, "w", encoding="utf-8") as f:
+        json.dump(mem, f)
+    keys = list(mem)[:100]
+    add(0, "memory.get_memory_category", len(keys), measure(
+        lambda: [memory.get_memory_category(k) for k in keys], repeat,
+    ))
+
+    # ----- por tamaño: un usuario con N records -----
+    for size in sizes:
+        email = f"bench{size}@example.com"
+        r = client.post("/auth/register", json={"email": email, "password": "bench-password"})
+        r.raise_for_status()
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        db = SessionLocal()
+        user_id = db.query(app_module.User.id).filter(app_module.User.email == email).scalar()
+        bind_user(db, user_id)
+
+        t0 = time.perf_counter()
+        synth.populate(writer_engine_for(user_id), user_id, size, seed=size)
+        print(f"{size:>9}  (populate {time.perf_counter() - t0:.1f} s)")
+
+        last_month = db.query(Record.date).filter(Record.user_id == user_id).order_by(Record.date.desc()).first()[0][:7]
+        rows = db.query(Record).filter(Record.user_id == user_id).all()
+        txs = [Transaction(r.date, r.description, r.amount, r.category, r.confidence) for r in rows]
+        del rows
+        db.close()
+
+        add(size, "build_summary", len(txs), measure(lambda: build_summary(txs, last_month), repeat))
+        del txs
+
+        batch = synth.make_records(500, seed=size + 1)
+        for it in batch:
+            it["date"] = "2030-01-15"  # fuera del rango de los reportes medidos
+
+        def post_records():
+            client.post("/records", json=batch, headers=headers).raise_for_status()
+
+        add(size, "POST /records (500)", len(batch), measure(post_records, repeat))
+
+        def report():
+            client.get(f"/report/{last_month}", headers=headers).raise_for_status()
+
+        add(size, "GET /report (cold)", 1, measure(report, repeat, setup=txcache.clear))
+        add(size, "GET /report (warm)", 1, measure(report, repeat))
+
+        # un mes nuevo por repetición: en un mes ya generado el endpoint no inserta nada
+        gen_months = iter(f"{2031 + i // 12}-{i % 12 + 1:02d}" for i in range(repeat))
+
+        def generate():
+            client.post(f"/recurring/generate/{next(gen_months)}", headers=headers).raise_for_status()
+
+        add(size, "POST /recurring/generate", 1, measure(generate, repeat))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base = {(r["size"], r["name"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline_path} ({baseline['meta'].get('commit') or '?'}): ratio < 1 = más rápido")
+    for r in current["results"]:
+        b = base.get((r["size"], r["name"]))
+        if b and b["median_s"]:
+            print(f"{r['size']:>9}  {r['name']:<28} x{r['median_s'] / b['median_s']:.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks de Money AI.")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="records por usuario, separados por coma")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", help="guarda resultados en JSON")
+    ap.add_argument("--compare", help="JSON de una corrida anterior")
+    args = ap.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    tmp = tempfile.mkdtemp(prefix="moneyai-bench-")
+    _setup_env(os.path.join(tmp, "bench.db"))
+
+    try:
+        result = run(sizes, max(1, args.repeat), tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResultados en {args.out}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import random
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.engine import Engine
+
+from ai.rules import classify
+from core.models import Record, RecurringRule, UserRule
+
+# =========================
+# Datos sintéticos para benchmarks
+# =========================
+# Comercios con el ruido de un estado de cuenta real (sucursal, referencia,
+# ciudad), nómina / renta / suscripciones mensuales y reglas por usuario.
+# Todo sale de un random.Random(seed): misma semilla, mismos datos.
+
+MERCHANTS: List[Tuple[str, float, float]] = [
+    # (plantilla, monto mínimo, monto máximo) -- gastos
+    ("OXXO {n} {city}", 15, 250),
+    ("7-ELEVEN {n} {city}", 20, 200),
+    ("UBER *TRIP {ref}", 45, 380),
+    ("DIDI FOOD {ref}", 90, 450),
+    ("WALMART SUPERCENTER #{n}", 150, 3200),
+    ("SORIANA HIPER {n} {city}", 120, 2500),
+    ("COSTCO WHOLESALE #{n}", 400, 6000),
+    ("STARBUCKS {city} {n}", 55, 180),
+    ("RESTAUR LA PARRILLA {city}", 250, 1800),
+    ("PEMEX GAS ESTACION {n}", 300, 1200),
+    ("AMAZON MX MARKETPLACE {ref}", 99, 4000),
+    ("MERCADOPAGO*{ref}", 50, 1500),
+    ("LIVERPOOL {city} {n}", 300, 5000),
+    ("FARMACIA GUADALAJARA {n}", 40, 800),
+    ("TELCEL RECARGA {ref}", 100, 500),
+]
+
+MONTHLY: List[Tuple[str, float, int]] = [
+    # (descripción, monto, día) -- recurrentes
+    ("NOMINA EMPRESA SA DE CV", 32000.0, 15),
+    ("NOMINA EMPRESA SA DE CV", 32000.0, 30),
+    ("TRANSF RENTA DEPTO", -12500.0, 1),
+    ("NETFLIX.COM", -219.0, 8),
+    ("SPOTIFY P{ref}", -115.0, 12),
+    ("CFE SUMINISTRADOR {ref}", -640.0, 20),
+    ("IZZI TELECOM {ref}", -549.0, 5),
+]
+
+CITIES = ["CDMX", "GDL", "MTY", "PUE", "QRO", "MERIDA", "TIJUANA"]
+
+USER_RULES = [
+    ("MERCADOPAGO", "Compras"),
+    ("LIVERPOOL", "Ropa"),
+    ("FARMACIA", "Salud"),
+    ("DIDI FOOD", "Restaurantes"),
+]
+
+
+def _fill(rng: random.Random, template: str) -> str:
+    return template.format(
+        n=rng.randint(100, 9999),
+        ref=f"{rng.randint(0, 16 ** 6 - 1):06X}",
+        city=rng.choice(CITIES),
+    )
+
+
+def make_records(n: int, seed: int = 0, end: date = date(2026, 6, 30)) -> List[dict]:
+    """
+    ~n items {date, description, amount, source} hacia atrás desde `end`.
+    Por cada mes: los MONTHLY + gastos variables hasta completar n.
+    """
+    rng = random.Random(seed)
+    variable_per_month = 120
+    months = max(1, n // (variable_per_month + len(MONTHLY)))
+    items: List[dict] = []
+
+    first = date(end.year, end.month, 1)
+    for m in range(months):
+        y, mo = divmod(first.year * 12 + first.month - 1 - m, 12)
+        start = date(y, mo + 1, 1)
+        for desc, amount, day in MONTHLY:
+            items.append({
+                "date": start.replace(day=min(day, 28)).isoformat(),
+                "description": _fill(rng, desc),
+                "amount": amount if amount > 0 else round(amount * rng.uniform(0.97, 1.03), 2),
+                "source": "import",
+            })
+        for _ in range(variable_per_month):
+            template, lo, hi = rng.choice(MERCHANTS)
+            items.append({
+                "date": (start + timedelta(days=rng.randint(0, 27))).isoformat(),
+                "description": _fill(rng, template),
+                "amount": -round(rng.uniform(lo, hi), 2),
+                "source": "import",
+            })
+        if len(items) >= n:
+            break
+
+    while len(items) < n:  # n muy chico o no múltiplo del mes
+        template, lo, hi = rng.choice(MERCHANTS)
+        items.append({
+            "date": (end - timedelta(days=rng.randint(0, 27))).isoformat(),
+            "description": _fill(rng, template),
+            "amount": -round(rng.uniform(lo, hi), 2),
+            "source": "import",
+        })
+
+    items = items[:n]
+    items.sort(key=lambda it: it["date"])
+    return items
+
+
+def make_memory(n: int, seed: int = 0) -> Dict[str, str]:
+    rng = random.Random(seed)
+    out = {}
+    while len(out) < n:
+        template, _, _ = rng.choice(MERCHANTS)
+        out[_fill(rng, template)] = rng.choice(["Super", "Transporte", "Comercio", "Otros"])
+    return out
+
+
+def populate(engine: Engine, user_id: int, n: int, seed: int = 0, batch: int = 20000) -> None:
+    """
+    Carga n records ya clasificados + reglas + recurrentes para user_id con
+    INSERT masivos (sin el ORM, para poder generar millones de filas rápido).
+    Los hooks del ORM no corren aquí: category_stats y sync_state se ajustan
+    al final y los caches en memoria se llenan en la primera lectura.
+    """
+    rules = [(contains, category) for contains, category in USER_RULES]
+    with engine.begin() as conn:
+        conn.execute(insert(UserRule), [
+            {"user_id": user_id, "contains": c, "category": cat, "change_seq": 1} for c, cat in rules
+        ])
+        conn.execute(insert(RecurringRule), [
+            {"user_id": user_id, "name": d.split("{")[0].strip(), "amount": a, "category": "Ingreso" if a > 0 else "Fijos",
+             "schedule": "monthly", "day_of_month": day, "active": True}
+            for d, a, day in MONTHLY
+        ])
+
+    items = make_records(n, seed)
+    for i in range(0, len(items), batch):
+        rows = []
+        for it in items[i:i + batch]:
+            category, confidence = classify(it["description"], it["amount"], user_rules=rules)
+            rows.append({
+                "user_id": user_id, "date": it["date"], "description": it["description"],
+                "amount": it["amount"], "category": category, "confidence": confidence,
+                "source": it["source"], "change_seq": 1,
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(Record), rows)
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO sync_state (user_id, seq) VALUES (:u, 1) ON CONFLICT (user_id) DO NOTHING"
+        ), {"u": user_id})
+        conn.execute(text("DELETE FROM category_stats WHERE user_id = :u"), {"u": user_id})
+        conn.execute(text(
+            """INSERT INTO category_stats (user_id, category, count, mean, m2)
+            SELECT user_id, category, COUNT(*), AVG(-amount),
+                   MAX(0.0, SUM(amount * amount) - COUNT(*) * AVG(-amount) * AVG(-amount))
+            FROM records
+            WHERE user_id = :u AND amount < 0
+            GROUP BY user_id, category"""
+        ), {"u": user_id})
@@ -0,0 +1,172 @@
+import mmap
+import os
+import struct
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from core.database import DATABASE_URL
+
+# =========================
+# Coherencia de caches entre workers
+# =========================
+# Cada worker de uvicorn tiene sus propios caches por usuario (txcache,
+# usuarios de auth); un commit en un worker no llega a los otros. Para eso hay
+# un archivo compartido mapeado en memoria con un slot de 8 bytes por usuario
+# (user_id % CACHE_STAMP_SLOTS):
+# - después de cada commit que toca datos de un usuario se escribe un token
+#   aleatorio de 64 bits en su slot (aleatorio y no contador: no hace falta
+#   incremento atómico entre procesos, cualquier escritura cambia el valor)
+# - en cada request autenticado se lee el slot (una lectura de memoria); si no
+#   es el último token visto por este worker, se vacían los caches de ese
+#   usuario (on_stale) y se recargan de la DB
+# Las escrituras del propio worker ya se aplicaron como deltas y no lo
+# invalidan. Las escrituras con SQL directo (sin el ORM) no marcan el slot;
+# ahí sigue valiendo el TTL de cada cache.
+CACHE_STAMPS = os.getenv("CACHE_STAMPS", "1") == "1"
+CACHE_STAMP_SLOTS = int(os.getenv("CACHE_STAMP_SLOTS", "65536"))
+
+_PENDING_KEY = "coherence_users"
+_SLOT = struct.Struct("<Q")
+
+
+def _default_path() -> Optional[str]:
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        return url.database + "-stamps"
+    return None
+
+
+CACHE_STAMP_FILE = os.getenv("CACHE_STAMP_FILE") or _default_path()
+
+
+class StampFile:
+    """
+    Slots de 8 bytes en un archivo compartido. Un slot en 0 = nunca escrito.
+    """
+
+    def __init__(self, path: str, slots: int):
+        self.slots = max(1, slots)
+        size = self.slots * _SLOT.size
+        with open(path, "a+b") as f:
+            if os.fstat(f.fileno()).st_size < size:
+                f.truncate(size)  # varios procesos a la vez: todos truncan al mismo tamaño
+            self._mm = mmap.mmap(f.fileno(), size)
+
+    def _offset(self, user_id: int) -> int:
+        return (user_id % self.slots) * _SLOT.size
+
+    def read(self, user_id: int) -> int:
+        return _SLOT.unpack_from(self._mm, self._offset(user_id))[0]
+
+    def bump(self, user_id: int) -> Tuple[int, int]:
+        """
+        Escribe un token nuevo. Devuelve (anterior, nuevo).
+        """
+        off = self._offset(user_id)
+        old = _SLOT.unpack_from(self._mm, off)[0]
+        new = int.from_bytes(os.urandom(8), "little") | 1
+        _SLOT.pack_into(self._mm, off, new)
+        return old, new
+
+
+_stamps: Optional[StampFile] = None
+_unavailable = False
+_open_lock = threading.Lock()
+_seen: Dict[int, int] = {}
+_evictors: List[Callable[[int], None]] = []
+
+
+def _get_stamps() -> Optional[StampFile]:
+    global _stamps, _unavailable
+    if _stamps is None and CACHE_STAMPS and CACHE_STAMP_FILE and not _unavailable:
+        with _open_lock:
+            if _stamps is None and not _unavailable:
+                try:
+                    _stamps = StampFile(CACHE_STAMP_FILE, CACHE_STAMP_SLOTS)
+                except OSError:
+                    _unavailable = True  # sin archivo compartido: solo quedan los TTL
+    return _stamps
+
+
+def on_stale(fn: Callable[[int], None]) -> Callable[[int], None]:
+    """
+    Registra fn(user_id), que vacía un cache de ese usuario.
+    """
+    _evictors.append(fn)
+    return fn
+
+
+def _evict(user_id: int) -> None:
+    for fn in _evictors:
+        fn(user_id)
+
+
+def check(user_id: int) -> None:
+    """
+    Al inicio del request: si otro proceso escribió datos del usuario desde
+    la última vez, vacía sus caches en este proceso.
+    """
+    stamps = _get_stamps()
+    if stamps is None:
+        return
+    token = stamps.read(user_id)
+    if _seen.get(user_id) == token:
+        return
+    _seen[user_id] = token
+    _evict(user_id)
+
+
+def mark_changed(user_ids: Set[int]) -> None:
+    stamps = _get_stamps()
+    if stamps is None:
+        return
+    for user_id in user_ids:
+        old, new = stamps.bump(user_id)
+        if _seen.get(user_id, old) != old:
+            # otro proceso escribió desde nuestra última lectura: lo nuestro
+            # tampoco está al día
+            _evict(user_id)
+        _seen[user_id] = new
+
+
+# -------------------------
+# Hooks de Session
+# -------------------------
+@event.listens_for(Session, "after_flush")
+def _collect(session: Session, _ctx) -> None:
+    users: Set[int] = set()
+    for obj in list(session.new) + list(session.deleted):
+        _add_owner(users, obj)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            _add_owner(users, obj)
+    if users:
+        session.info.setdefault(_PENDING_KEY, set()).update(users)
+
+
+def _add_owner(users: Set[int], obj) -> None:
+    if getattr(obj, "__tablename__", None) == "users":
+        users.add(obj.id)
+    else:
+        user_id = getattr(obj, "user_id", None)
+        if user_id is not None:
+            users.add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session: Session) -> None:
+    users = session.info.pop(_PENDING_KEY, None)
+    if users:
+        mark_changed(users)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard(session: Session, previous_transaction) -> None:
+    # solo el rollback de la transacción externa; un SAVEPOINT revertido deja
+    # usuarios de más (una invalidación de sobra, nunca un dato viejo)
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
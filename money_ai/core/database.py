@@ -1,13 +1,111 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
+from typing import List, Optional
 
-DATABASE_URL = "sqlite:///./moneyai.db"
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+# DATABASE_URL permite apuntar a otra DB (benchmarks, pruebas de carga)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./moneyai.db")
+
+# Sharding opcional: SHARD_COUNT=N reparte los datos de cada usuario (records,
+# reglas, recurrentes, jobs, stats, sync) en N archivos SQLite por user_id % N;
+# DATABASE_URL queda como directorio (solo la tabla users). Cada shard tiene su
+# propio lock de escritura, así un import pesado solo frena a los usuarios de
+# su shard. 0 = una sola DB, como siempre.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_URL = os.getenv("SHARD_URL", "sqlite:///./moneyai-shard{shard}.db")
 
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False},
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
 Base = declarative_base()
+
+# Motor del hilo escritor (core/writer.py) y de las migraciones. pysqlite maneja BEGIN por
+# su cuenta y rompe los SAVEPOINT, así que le quitamos el control y abrimos la
+# transacción nosotros con BEGIN IMMEDIATE (el escritor siempre va a escribir).
+def _writer_events(e: Engine) -> Engine:
+    @event.listens_for(e, "connect")
+    def _writer_connect(dbapi_conn, _record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(e, "begin")
+    def _writer_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return e
+
+writer_engine = _writer_events(create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+))
+
+shard_engines: List[Engine] = [
+    create_engine(SHARD_URL.format(shard=i), connect_args={"check_same_thread": False})
+    for i in range(SHARD_COUNT)
+]
+shard_writer_engines: List[Engine] = [
+    _writer_events(create_engine(SHARD_URL.format(shard=i), connect_args={"check_same_thread": False}))
+    for i in range(SHARD_COUNT)
+]
+
+# todas las DB (migraciones, check de esquema, métricas)
+engines: List[Engine] = [engine] + shard_engines
+writer_engines: List[Engine] = [writer_engine] + shard_writer_engines
+
+
+class ShardNotResolved(Exception):
+    pass
+
+
+def shard_of(user_id: int) -> Optional[int]:
+    return user_id % SHARD_COUNT if SHARD_COUNT > 0 else None
+
+
+class RoutingSession(Session):
+    """
+    Sesión del modo sharding: User va al directorio; todo lo demás (modelos,
+    SQL crudo, session.connection()) va al shard de session.info["shard"],
+    que pone bind_user() (get_current_user, jobs, export...).
+    """
+
+    def __init__(self, *args, directory: Engine, shards: List[Engine], **kwargs):
+        super().__init__(*args, **kwargs)
+        self._directory = directory
+        self._shards = shards
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if mapper is not None and mapper.class_.__tablename__ == "users":
+            return self._directory
+        shard = self.info.get("shard")
+        if shard is not None:
+            return self._shards[shard]
+        if mapper is None:
+            return self._directory
+        raise ShardNotResolved(f"{mapper.class_.__name__} necesita un shard: falta bind_user(session, user_id)")
+
+
+def bind_user(session: Session, user_id: int) -> Session:
+    """
+    Fija el shard del usuario en la sesión. Sin sharding no hace nada.
+    """
+    if SHARD_COUNT > 0:
+        session.info["shard"] = shard_of(user_id)
+    return session
+
+
+def writer_engine_for(user_id: int) -> Engine:
+    shard = shard_of(user_id)
+    return writer_engine if shard is None else shard_writer_engines[shard]
+
+
+if SHARD_COUNT > 0:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, class_=RoutingSession,
+                                directory=engine, shards=shard_engines)
+    WriterSession = sessionmaker(autocommit=False, autoflush=False, class_=RoutingSession,
+                                 directory=writer_engine, shards=shard_writer_engines)
+else:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    WriterSession = sessionmaker(autocommit=False, autoflush=False, bind=writer_engine)
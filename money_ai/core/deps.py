@@ -1,13 +1,29 @@
+import os
+import time
+
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
 
-from core.database import SessionLocal
+from core import coherence
+from core.cache import TTLCache
+from core.database import SessionLocal, bind_user
 from core.models import User
-from core.security import decode_token
+from core.security import decode_token_claims
 
 bearer = HTTPBearer(auto_error=False)
 
+# Fast path de auth: token verificado -> user_id y user_id -> fila activa.
+# El TTL acota cuánto puede tardar en verse un cambio hecho fuera del ORM.
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+_token_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+_user_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+_USER_COLUMNS = [c.key for c in User.__table__.columns]
+
 def get_db():
     db = SessionLocal()
     try:
@@ -15,6 +31,38 @@ def get_db():
     finally:
         db.close()
 
+@coherence.on_stale
+def invalidate_user(user_id: int) -> None:
+    _user_cache.pop(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(_mapper, _conn, target: User) -> None:
+    # desactivar / borrar un usuario lo saca del cache en cuanto se hace flush
+    invalidate_user(target.id)
+
+def _verify_token(token: str) -> int:
+    user_id = _token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    user_id, exp = decode_token_claims(token)
+    _token_cache.set(token, user_id, ttl=exp - time.time())
+    return user_id
+
+def _load_user(db: Session, user_id: int):
+    snap = _user_cache.get(user_id)
+    if snap is not None:
+        # reconstruye la fila y la asocia a la sesión sin ir a la DB
+        user = User(**snap)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    user = db.query(User).filter(User.id == user_id, User.is_active == True).first()
+    if user:
+        _user_cache.set(user_id, {k: getattr(user, k) for k in _USER_COLUMNS})
+    return user
+
 def get_current_user(
     creds: HTTPAuthorizationCredentials = Depends(bearer),
     db: Session = Depends(get_db),
@@ -23,11 +71,13 @@ def get_current_user(
         raise HTTPException(status_code=401, detail="Missing auth token")
 
     try:
-        user_id = decode_token(creds.credentials)
+        user_id = _verify_token(creds.credentials)
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid auth token")
 
-    user = db.query(User).filter(User.id == user_id, User.is_active == True).first()
+    coherence.check(user_id)  # otro worker escribió: vacía los caches de este usuario
+    user = _load_user(db, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    bind_user(db, user.id)  # con sharding, el resto del request va al shard del usuario
     return user
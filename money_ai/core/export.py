@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+import os
+import zlib
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select, tuple_
+
+from core.database import SessionLocal, bind_user
+from core.models import Record
+
+# =========================
+# Export masivo de records
+# =========================
+# Se lee por bloques con paginación por llave (date, id) sobre ix_records_user_date:
+# cada bloque es un SELECT corto, así un export de años no deja abierta una
+# lectura que bloquee al escritor de SQLite, y la memoria queda acotada a un bloque.
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+COLUMNS = ["id", "date", "description", "amount", "category", "confidence", "source"]
+
+
+class ExportError(Exception):
+    pass
+
+
+def _load_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("El formato parquet requiere pyarrow (pip install pyarrow)")
+    return pa, pq
+
+
+def check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise ExportError(f"format debe ser uno de: {', '.join(FORMATS)}")
+    if fmt == "parquet":
+        _load_pyarrow()
+
+
+def iter_chunks(user_id: int, start: Optional[str], end: Optional[str],
+                chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[List[tuple]]:
+    """
+    Bloques de filas (COLUMNS) ordenadas por (date, id). end es exclusivo.
+    """
+    cols = [getattr(Record, c) for c in COLUMNS]
+    base = select(*cols).where(Record.user_id == user_id)
+    if start:
+        base = base.where(Record.date >= start)
+    if end:
+        base = base.where(Record.date < end)
+    base = base.order_by(Record.date, Record.id).limit(chunk_rows)
+
+    db = bind_user(SessionLocal(), user_id)
+    try:
+        last = None
+        while True:
+            q = base if last is None else base.where(tuple_(Record.date, Record.id) > last)
+            rows = [tuple(r) for r in db.execute(q)]
+            db.rollback()  # suelta la lectura entre bloques
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_rows:
+                return
+            last = (rows[-1][1], rows[-1][0])
+    finally:
+        db.close()
+
+
+def _csv(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _ndjson(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(COLUMNS, r)), ensure_ascii=False) + "\n" for r in rows
+        ).encode("utf-8")
+
+
+class _Sink(io.RawIOBase):
+    """
+    Archivo de solo escritura que acumula lo escrito hasta que se drena.
+    """
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+def _parquet(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    pa, pq = _load_pyarrow()
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.string()),
+        ("description", pa.string()),
+        ("amount", pa.float64()),
+        ("category", pa.string()),
+        ("confidence", pa.float64()),
+        ("source", pa.string()),
+    ])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in chunks:
+            # un row group por bloque
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=f.type) for col, f in zip(columns, schema)], schema=schema,
+            ))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _gzip(stream: Iterator[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = formato gzip
+    for data in stream:
+        out = z.compress(data)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def export_stream(user_id: int, start: Optional[str], end: Optional[str],
+                  fmt: str, gzip: bool = False) -> Iterator[bytes]:
+    encoders = {"csv": _csv, "ndjson": _ndjson, "parquet": _parquet}
+    stream = encoders[fmt](iter_chunks(user_id, start, end))
+    return _gzip(stream) if gzip else stream
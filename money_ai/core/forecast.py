@@ -0,0 +1,256 @@
+import os
+import weakref
+from collections import defaultdict
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.cache import TTLCache
+from core.database import bind_user, shard_of
+from core.models import Record, RecurringRule, User
+from core.txcache import BAD_DAY, UserFrame, get_frame, month_bounds, parse_days
+from ai.finance import build_forecast, daily_run_rate, explain_forecast
+from ai.recurring import STALE_DAYS, covered, description_key, discover, match_candidates
+
+# =========================
+# Pronóstico de fin de mes
+# =========================
+# actual del mes + records ya registrados para los días que faltan (p. ej.
+# recurrentes generados) + reglas recurrentes pendientes + run-rate diario por
+# categoría (gasto no recurrente de los últimos RUNRATE_DAYS días).
+# "No recurrente" excluye también los cargos fijos que no vienen de una regla
+# (la renta importada del banco, p. ej.): ai.recurring.discover los detecta en
+# los últimos FIXED_LOOKBACK_DAYS días; si este mes ya se cargaron cuentan en
+# actual y si no, como pendientes (detected). Sin esto la renta entraba al
+# run-rate y se proyectaba otra vez sobre los días restantes.
+# El run-rate se guarda por (usuario, mes, día de corte) junto con una
+# referencia débil al frame del que salió: si el frame cambió (hubo
+# escrituras) se recalcula, y el cache no retiene frames ya desalojados.
+RUNRATE_DAYS = int(os.getenv("RUNRATE_DAYS", "90"))
+RUNRATE_MIN_DAYS = int(os.getenv("RUNRATE_MIN_DAYS", "14"))  # menos historia: se usa el ritmo del mes
+FIXED_LOOKBACK_DAYS = int(os.getenv("FIXED_LOOKBACK_DAYS", "180"))
+FIXED_MIN_CONFIDENCE = float(os.getenv("FIXED_MIN_CONFIDENCE", "0.5"))
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "10000"))
+FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", "3600"))
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+_projections = TTLCache(FORECAST_CACHE_SIZE, FORECAST_CACHE_TTL)
+
+Generated = Set[Tuple[str, str, float]]  # (date, description, amount) de records recurrentes
+History = List[Tuple[int, str, str, float, str]]  # (id, date, description, amount, category), sin recurrentes
+
+
+def _day(d: date) -> int:
+    return d.toordinal() - _EPOCH
+
+
+def fixed_charges(user_id: int, frame: UserFrame, start: int, end: int,
+                  load: Callable[[], History]) -> Tuple[np.ndarray, List[dict]]:
+    """
+    Cargos fijos detectados en el historial (load: records no recurrentes de
+    [start - FIXED_LOOKBACK_DAYS, end)). Devuelve (máscara sobre las filas del
+    frame, candidatos de discover con "booked": ya cargado en el mes).
+    load solo se llama si el cache no sirve (mismo criterio que run_rate).
+    """
+    key = (user_id, "fixed", start)
+    hit = _projections.get(key)
+    if hit is not None and hit[0]() is frame:
+        return hit[1]
+
+    rows = load()
+    days = parse_days([r[1] for r in rows])
+    ok = days != BAD_DAY
+    rows = [r for r, k in zip(rows, ok.tolist()) if k]
+    days = days[ok]
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    descriptions = [r[2] for r in rows]
+    amounts = np.array([r[3] for r in rows], dtype=np.float64)
+
+    candidates = [
+        c for c in discover(days, descriptions, amounts, [r[4] for r in rows], today=start)
+        if c["confidence"] >= FIXED_MIN_CONFIDENCE
+    ]
+    match = match_candidates(descriptions, amounts, candidates)
+    fixed = match >= 0
+
+    booked = np.zeros(len(candidates), dtype=bool)
+    booked[match[fixed & (days >= start) & (days < end)]] = True
+    candidates = [dict(c, booked=bool(b)) for c, b in zip(candidates, booked.tolist())]
+
+    # ids -> filas del frame (ordenado por id)
+    mask = np.zeros(len(frame), dtype=bool)
+    fixed_ids = ids[fixed]
+    pos = np.searchsorted(frame.ids, fixed_ids)
+    found = pos < len(frame)
+    found[found] = frame.ids[pos[found]] == fixed_ids[found]
+    mask[pos[found]] = True
+
+    result = (mask, candidates)
+    _projections.set(key, (weakref.ref(frame), result))
+    return result
+
+
+def run_rate(user_id: int, frame: UserFrame, start: int, cutoff: int, fixed: np.ndarray) -> np.ndarray:
+    """
+    Gasto diario no recurrente por categoría (códigos del frame).
+    fixed: filas de cargos fijos detectados (ver fixed_charges), fuera del ritmo.
+    Historia: [start - RUNRATE_DAYS, start); si hay poca, el ritmo del mes hasta cutoff.
+    """
+    key = (user_id, start, cutoff)
+    hit = _projections.get(key)
+    if hit is not None and hit[0]() is frame:
+        return hit[1]
+
+    valid = (frame.days != BAD_DAY) & ~frame.recurring & ~fixed
+    days, amounts, cats = frame.days[valid], frame.amounts[valid], frame.cats[valid]
+    n_cats = len(frame.categories)
+
+    first = int(days.min()) if len(days) else start
+    lo = max(start - RUNRATE_DAYS, first)
+    if start - lo >= RUNRATE_MIN_DAYS:
+        rates = daily_run_rate(days, amounts, cats, n_cats, lo, start)
+    else:
+        rates = daily_run_rate(days, amounts, cats, n_cats, start, cutoff)
+
+    _projections.set(key, (weakref.ref(frame), rates))
+    return rates
+
+
+def pending_rules(rules: List[RecurringRule], generated: Generated, month: str) -> List[dict]:
+    """
+    Reglas activas que aún no tienen su record del mes (mismo criterio que
+    /recurring/generate/{month}).
+    """
+    out = []
+    for rule in rules:
+        dd = max(1, min(28, int(rule.day_of_month)))
+        key = (f"{month}-{dd:02d}", f"[REC] {rule.name}", rule.amount)
+        if key not in generated:
+            out.append({"name": rule.name, "amount": rule.amount, "category": rule.category, "day": dd})
+    return out
+
+
+def pending_detected(detected: List[dict], rules: List[RecurringRule], start: int) -> List[dict]:
+    """
+    Cargos fijos detectados que aún no aparecen este mes, sin los que ya cubre
+    una regla (esos van por pending_rules) ni los que dejaron de aparecer.
+    """
+    existing = [(description_key(r.name), r.amount) for r in rules]
+    out = []
+    for c in detected:
+        last = _day(date.fromisoformat(c["last_date"]))
+        if c["booked"] or start - last > STALE_DAYS or covered(c, existing):
+            continue
+        out.append({"name": c["name"], "amount": c["amount"], "category": c["category"],
+                    "day": c["day_of_month"], "detected": True})
+    return out
+
+
+def _forecast(user_id: int, frame: UserFrame, rules: List[RecurringRule], generated: Generated,
+              load_history: Callable[[], History], month: str, as_of: date) -> dict:
+    start, end = month_bounds(month)
+    # días transcurridos: hasta as_of inclusive, acotado al mes
+    cutoff = min(max(_day(as_of) + 1, start), end)
+    fixed, detected = fixed_charges(user_id, frame, start, end, load_history)
+
+    def totals(lo: int, hi: int) -> Tuple[float, float]:
+        amounts = frame.amounts[(frame.days >= lo) & (frame.days < hi)]
+        return float(amounts[amounts > 0].sum()), 0.0 - float(amounts[amounts < 0].sum())
+
+    actual_income, actual_expense = totals(start, cutoff)
+    scheduled_income, scheduled_expense = totals(cutoff, end)
+
+    pending = pending_rules(rules, generated, month) + pending_detected(detected, rules, start) if cutoff < end else []
+    rates = run_rate(user_id, frame, start, cutoff, fixed)
+
+    forecast = build_forecast(
+        month, actual_income, actual_expense, scheduled_income, scheduled_expense,
+        pending, rates, frame.categories, end - cutoff,
+    )
+    forecast["as_of"] = as_of.isoformat()
+    forecast["message"] = explain_forecast(forecast)
+    return forecast
+
+
+def _active_rules(db: Session, user_id: Optional[int] = None) -> Dict[int, List[RecurringRule]]:
+    q = db.query(RecurringRule).filter(
+        RecurringRule.active == True,
+        RecurringRule.schedule == "monthly",
+    )
+    if user_id is not None:
+        q = q.filter(RecurringRule.user_id == user_id)
+    by_user: Dict[int, List[RecurringRule]] = defaultdict(list)
+    for rule in q.order_by(RecurringRule.id.asc()):
+        by_user[rule.user_id].append(rule)
+    return by_user
+
+
+def _generated(db: Session, month: str, user_id: Optional[int] = None) -> Dict[int, Generated]:
+    q = select(Record.user_id, Record.date, Record.description, Record.amount).where(
+        Record.source == "recurring",
+        Record.date.startswith(month),
+    )
+    if user_id is not None:
+        q = q.where(Record.user_id == user_id)
+    by_user: Dict[int, Generated] = defaultdict(set)
+    for uid, d, desc, amount in db.execute(q):
+        by_user[uid].add((d, desc, amount))
+    return by_user
+
+
+def _history(db: Session, month: str, user_id: Optional[int] = None) -> Dict[int, History]:
+    start, end = month_bounds(month)
+    lo = date.fromordinal(start - FIXED_LOOKBACK_DAYS + _EPOCH).isoformat()
+    hi = date.fromordinal(end + _EPOCH).isoformat()
+    q = select(Record.user_id, Record.id, Record.date, Record.description, Record.amount, Record.category).where(
+        Record.source != "recurring",
+        Record.date >= lo,
+        Record.date < hi,
+    )
+    if user_id is not None:
+        q = q.where(Record.user_id == user_id)
+    by_user: Dict[int, History] = defaultdict(list)
+    for uid, *row in db.execute(q):
+        by_user[uid].append(tuple(row))
+    return by_user
+
+
+def forecast_user(db: Session, user_id: int, month: str, as_of: Optional[date] = None) -> dict:
+    if month_bounds(month) is None:
+        raise ValueError(f"Mes inválido: {month}")
+    frame = get_frame(db, user_id)
+    rules = _active_rules(db, user_id)[user_id]
+    generated = _generated(db, month, user_id)[user_id]
+    return _forecast(user_id, frame, rules, generated, lambda: _history(db, month, user_id)[user_id],
+                     month, as_of or date.today())
+
+
+def forecast_all(db: Session, month: str, as_of: Optional[date] = None) -> Iterator[Tuple[int, dict]]:
+    """
+    Batch nocturno: reglas, records recurrentes e historial para cargos fijos
+    de todos los usuarios en tres queries (tres por shard); el historial de
+    cada uno sale del cache columnar.
+    """
+    if month_bounds(month) is None:
+        raise ValueError(f"Mes inválido: {month}")
+    as_of = as_of or date.today()
+    user_ids = db.execute(select(User.id).where(User.is_active == True).order_by(User.id)).scalars().all()
+
+    by_shard: Dict[Optional[int], List[int]] = defaultdict(list)
+    for user_id in user_ids:
+        by_shard[shard_of(user_id)].append(user_id)
+
+    for shard_user_ids in by_shard.values():
+        bind_user(db, shard_user_ids[0])
+        rules = _active_rules(db)
+        generated = _generated(db, month)
+        history = _history(db, month)
+        for user_id in shard_user_ids:
+            frame = get_frame(db, user_id)
+            yield user_id, _forecast(user_id, frame, rules[user_id], generated[user_id],
+                                     lambda: history[user_id], month, as_of)
+        db.rollback()  # suelta la lectura del shard antes del siguiente
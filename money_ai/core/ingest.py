@@ -0,0 +1,40 @@
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from core.models import Record, UserRule
+from ai.rules import classify
+
+
+def load_user_rules(db: Session, user_id: int) -> List[Tuple[str, str]]:
+    rules = db.query(UserRule).filter(UserRule.user_id == user_id).all()
+    return [(r.contains, r.category) for r in rules]
+
+
+def insert_records(
+    db: Session,
+    user_id: int,
+    items: Iterable[dict],
+    user_rules: Optional[List[Tuple[str, str]]] = None,
+) -> int:
+    """
+    Clasifica e inserta items {date, description, amount, source}.
+    No hace commit. Devuelve cuántos agregó.
+    """
+    if user_rules is None:
+        user_rules = load_user_rules(db, user_id)
+
+    added = 0
+    for item in items:
+        category, confidence = classify(item["description"], item["amount"], user_rules=user_rules)
+        db.add(Record(
+            user_id=user_id,
+            date=item["date"],
+            description=item["description"],
+            amount=item["amount"],
+            category=category,
+            confidence=confidence,
+            source=item.get("source") or "manual",
+        ))
+        added += 1
+    return added
@@ -0,0 +1,223 @@
+import os
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.responses import JSONResponse
+
+from core.database import SessionLocal, bind_user
+from core.ingest import insert_records, load_user_rules
+from core.models import Job
+from core.schemas import JobOut
+from core.writer import run_write
+from ai.statements import StatementError, iter_items
+
+# Trabajos en segundo plano (imports, ingest async de /records). Corren en el
+# mismo proceso que recibió el request; el estado vive en la tabla jobs para
+# que cualquier worker lo lea. Un reinicio pierde la cola en memoria: lo que
+# quedó queued / running se marca failed al migrar (fail_interrupted_jobs).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "64"))            # jobs en ejecución + en cola
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "1000"))  # filas por commit
+IMPORT_MAX_MB = float(os.getenv("IMPORT_MAX_MB", "50"))
+IMPORT_DIR = os.getenv("IMPORT_DIR") or None  # None = tmp del sistema
+MULTIPART_SLACK = 64 * 1024  # boundary + headers de la parte, sobre el tamaño del archivo
+
+_executor = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS), thread_name_prefix="moneyai-job")
+# los payloads de los jobs viven en memoria hasta que corren: cola acotada
+_slots = threading.BoundedSemaphore(max(1, JOB_QUEUE_MAX))
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    """Demasiados jobs pendientes; el endpoint debe responder 503."""
+
+
+def job_out(job: Job) -> JobOut:
+    return JobOut(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        filename=job.filename,
+        processed=job.processed,
+        total=job.total,
+        added=job.added,
+        error=job.error,
+    )
+
+
+def reserve_slot() -> None:
+    """
+    Reserva lugar en la cola ANTES de crear el job; se libera al terminar.
+    """
+    if not _slots.acquire(blocking=False):
+        raise JobQueueFull("Job queue is full, retry later")
+
+
+def release_slot() -> None:
+    _slots.release()
+
+
+def create_job(db: Session, user_id: int, kind: str, filename: Optional[str] = None,
+               total: Optional[int] = None) -> JobOut:
+    def work(s: Session) -> JobOut:
+        job = Job(user_id=user_id, kind=kind, status="queued", filename=filename,
+                  processed=0, added=0, total=total)
+        s.add(job)
+        s.flush()
+        return job_out(job)
+
+    return run_write(db, work)
+
+
+INTERRUPTED_ERROR = "Interrumpido por un reinicio del servidor; vuelve a enviarlo."
+
+
+def fail_interrupted_jobs(e: Engine) -> int:
+    """
+    Marca failed los jobs que quedaron queued / running. Solo con la API
+    apagada (migrate.py, o MIGRATE_ON_STARTUP con un solo proceso): con
+    workers vivos marcaría jobs que sí están corriendo en otro proceso.
+    """
+    with e.begin() as conn:
+        result = conn.execute(
+            update(Job.__table__)
+            .where(Job.status.in_(("queued", "running")))
+            .values(status="failed", error=INTERRUPTED_ERROR, updated_at=func.now())
+        )
+    return result.rowcount
+
+
+def _set_job(s: Session, job_id: int, **fields) -> None:
+    s.query(Job).filter(Job.id == job_id).update(fields, synchronize_session=False)
+
+
+class ImportSizeLimit:
+    """
+    Middleware ASGI: rechaza con 413 un POST a /imports cuyo Content-Length ya
+    pasa de IMPORT_MAX_MB, antes de que se lea (y se guarde) el cuerpo.
+    Sin Content-Length (chunked) el límite lo aplica save_upload.
+    """
+
+    def __init__(self, app, path: str = "/imports"):
+        self.app = app
+        self.path = path
+        self.limit = int(IMPORT_MAX_MB * 1024 * 1024) + MULTIPART_SLACK
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == self.path:
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.limit:
+                        response = JSONResponse({"detail": f"Archivo mayor a {IMPORT_MAX_MB:g} MB"}, status_code=413)
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+
+def discard_upload(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def save_upload(src: BinaryIO, filename: str) -> str:
+    """
+    Copia el upload a un archivo temporal (el job corre después del request).
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    fd, path = tempfile.mkstemp(prefix="moneyai-import-", suffix=ext, dir=IMPORT_DIR)
+    limit = int(IMPORT_MAX_MB * 1024 * 1024)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as dst:
+            while True:
+                buf = src.read(1 << 20)
+                if not buf:
+                    break
+                size += len(buf)
+                if size > limit:
+                    raise UploadTooLarge(f"Archivo mayor a {IMPORT_MAX_MB:g} MB")
+                dst.write(buf)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _run_ingest(job_id: int, user_id: int, blocks: Callable[[], Iterable[List[dict]]],
+                cleanup: Optional[Callable[[], None]] = None) -> None:
+    """
+    Clasifica e inserta cada bloque en su propia transacción junto con el
+    progreso del job. Libera el lugar de la cola al terminar.
+    """
+    db = bind_user(SessionLocal(), user_id)
+    try:
+        run_write(db, lambda s: _set_job(s, job_id, status="running"))
+        user_rules = load_user_rules(db, user_id)
+
+        processed = 0
+        added = 0
+        for items in blocks():
+            processed += len(items)
+            done_rows = processed
+
+            def work(s: Session) -> int:
+                n = insert_records(s, user_id, items, user_rules)
+                _set_job(s, job_id, processed=done_rows, added=added + n)
+                return n
+
+            added += run_write(db, work)
+
+        run_write(db, lambda s: _set_job(s, job_id, status="done"))
+    except Exception as e:
+        db.rollback()
+        if not isinstance(e, StatementError):
+            traceback.print_exc()
+        msg = str(e)[:500]
+        run_write(db, lambda s: _set_job(s, job_id, status="failed", error=msg))
+    finally:
+        db.close()
+        release_slot()
+        if cleanup:
+            cleanup()
+
+
+def run_import(job_id: int, user_id: int, path: str, filename: str) -> None:
+    """
+    Estado de cuenta subido a /imports: se lee por bloques desde el archivo temporal.
+    """
+    _run_ingest(
+        job_id, user_id,
+        lambda: iter_items(path, filename, chunk_rows=IMPORT_CHUNK_ROWS),
+        lambda: discard_upload(path),
+    )
+
+
+def run_records(job_id: int, user_id: int, rows: List[dict]) -> None:
+    """
+    POST /records?mode=async: el payload ya validado, en bloques.
+    """
+    def blocks():
+        for i in range(0, len(rows), IMPORT_CHUNK_ROWS):
+            yield rows[i:i + IMPORT_CHUNK_ROWS]
+
+    _run_ingest(job_id, user_id, blocks)
+
+
+def submit_import(job_id: int, user_id: int, path: str, filename: str) -> None:
+    _executor.submit(run_import, job_id, user_id, path, filename)
+
+
+def submit_records(job_id: int, user_id: int, rows: List[dict]) -> None:
+    _executor.submit(run_records, job_id, user_id, rows)
@@ -0,0 +1,216 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# =========================
+# Métricas (formato de texto de Prometheus)
+# =========================
+# Middleware ASGI: latencia por ruta (plantilla, no la URL), tamaños de
+# request / response, requests en curso y errores. Las queries de SQLAlchemy
+# se cuentan por request con un ContextVar desde los eventos del engine.
+# Sin dependencias: solo contadores en memoria del proceso (cada worker de
+# uvicorn expone los suyos).
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    """
+    Lo que se mide dentro de un request (DB). Se comparte por referencia con
+    los hilos del threadpool, que heredan una copia del contexto.
+    """
+
+    __slots__ = ("queries", "db_seconds", "statements", "_t0")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Optional[List[str]] = None  # texto de cada query, solo si se pide
+        self._t0 = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("moneyai_request", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], label: str = "route"):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._data: Dict[str, list] = {}  # label -> [counts por bucket..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._data.get(key)
+            if row is None:
+                row = self._data[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._data.items()]
+        for key, row in sorted(items):
+            lbl = f'{self.label}="{_escape(key)}"'
+            acc = 0
+            for le, n in zip(self.buckets, row):
+                acc += n
+                lines.append(f'{self.name}_bucket{{{lbl},le="{le:g}"}} {acc}')
+            acc += row[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{lbl},le="+Inf"}} {acc}')
+            lines.append(f"{self.name}_sum{{{lbl}}} {row[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{lbl}}} {acc}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ("route",)):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._data: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, key: tuple, value: float = 1) -> None:
+        with self._lock:
+            self._data[key] = self._data.get(key, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._data.items())
+        for key, v in items:
+            lbl = ",".join(f'{l}="{_escape(str(k))}"' for l, k in zip(self.labels, key))
+            lines.append(f"{self.name}{{{lbl}}} {v:g}")
+        return lines
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram("moneyai_request_duration_seconds", "Latencia por ruta", LATENCY_BUCKETS)
+REQUEST_BYTES = Histogram("moneyai_request_size_bytes", "Tamaño del body del request", SIZE_BUCKETS)
+RESPONSE_BYTES = Histogram("moneyai_response_size_bytes", "Tamaño del body de la respuesta", SIZE_BUCKETS)
+REQUEST_QUERIES = Histogram("moneyai_request_db_queries", "Queries SQL por request", QUERY_BUCKETS)
+REQUESTS = Counter("moneyai_requests_total", "Requests por ruta y status", ("route", "method", "status"))
+ERRORS = Counter("moneyai_request_errors_total", "Respuestas 5xx o excepciones por ruta")
+DB_SECONDS = Counter("moneyai_db_seconds_total", "Tiempo en la DB por ruta")
+
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+# métricas de otros módulos: fn() -> {nombre: valor} (gauges)
+_collectors: List[Tuple[str, Callable[[], Dict[str, float]]]] = []
+
+
+def register_collector(prefix: str, fn: Callable[[], Dict[str, float]]) -> None:
+    _collectors.append((prefix, fn))
+
+
+# -------------------------
+# DB: eventos del engine
+# -------------------------
+def instrument_engine(engine: Engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        if stats is not None:
+            stats._t0 = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += time.perf_counter() - stats._t0
+            if stats.statements is not None:
+                stats.statements.append(statement)
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class MetricsMiddleware:
+    """
+    ASGI puro (sin BaseHTTPMiddleware): no copia el body ni agrega una tarea por request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global _in_flight
+        stats = RequestStats()
+        token = current_request.set(stats)
+        state = {"status": 500, "in": 0, "out": 0}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["in"] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["out"] += len(message.get("body", b""))
+            await send(message)
+
+        with _in_flight_lock:
+            _in_flight += 1
+        t0 = time.perf_counter()
+        failed = False
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            with _in_flight_lock:
+                _in_flight -= 1
+            current_request.reset(token)
+
+            route = scope.get("route")
+            key = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(key, elapsed)
+            REQUEST_BYTES.observe(key, state["in"])
+            RESPONSE_BYTES.observe(key, state["out"])
+            REQUEST_QUERIES.observe(key, stats.queries)
+            DB_SECONDS.inc((key,), stats.db_seconds)
+            REQUESTS.inc((key, scope.get("method", ""), str(state["status"])))
+            if failed or state["status"] >= 500:
+                ERRORS.inc((key,))
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in (REQUEST_SECONDS, REQUEST_BYTES, RESPONSE_BYTES, REQUEST_QUERIES, REQUESTS, ERRORS, DB_SECONDS):
+        lines.extend(metric.render())
+    lines += ["# TYPE moneyai_requests_in_flight gauge", f"moneyai_requests_in_flight {_in_flight}"]
+    for prefix, fn in _collectors:
+        try:
+            values = fn()
+        except Exception:
+            continue
+        for name, value in sorted(values.items()):
+            full = f"moneyai_{prefix}_{name}"
+            lines += [f"# TYPE {full} gauge", f"{full} {float(value):g}"]
+    return "\n".join(lines) + "\n"
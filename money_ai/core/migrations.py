@@ -0,0 +1,223 @@
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+# =========================
+# Migraciones versionadas
+# =========================
+# Cada migración es (versión, nombre, pasos). Un paso es SQL o una función
+# fn(conn) para lo que no cabe en un statement (backfills, etc.).
+# Las migraciones ya publicadas NO se editan: cualquier cambio va en una nueva.
+Step = Union[str, Callable[[Connection], None]]
+
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (1, "esquema base", [
+        """CREATE TABLE IF NOT EXISTS users (
+            id INTEGER NOT NULL,
+            email VARCHAR NOT NULL,
+            password_hash VARCHAR NOT NULL,
+            is_active BOOLEAN NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+        """CREATE TABLE IF NOT EXISTS records (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            date VARCHAR NOT NULL,
+            description VARCHAR NOT NULL,
+            amount FLOAT NOT NULL,
+            category VARCHAR NOT NULL,
+            confidence FLOAT NOT NULL,
+            source VARCHAR NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_records_id ON records (id)",
+        "CREATE INDEX IF NOT EXISTS ix_records_user_id ON records (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_records_date ON records (date)",
+        """CREATE TABLE IF NOT EXISTS recurring_rules (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            amount FLOAT NOT NULL,
+            category VARCHAR NOT NULL,
+            schedule VARCHAR NOT NULL,
+            day_of_month INTEGER NOT NULL,
+            active BOOLEAN NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_recurring_rules_id ON recurring_rules (id)",
+        "CREATE INDEX IF NOT EXISTS ix_recurring_rules_user_id ON recurring_rules (user_id)",
+        """CREATE TABLE IF NOT EXISTS user_rules (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            contains VARCHAR NOT NULL,
+            category VARCHAR NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_user_rules_id ON user_rules (id)",
+        "CREATE INDEX IF NOT EXISTS ix_user_rules_user_id ON user_rules (user_id)",
+    ]),
+    (2, "índices compuestos por usuario", [
+        # /records/{month}, /report/{month}: user_id + prefijo de fecha
+        "CREATE INDEX IF NOT EXISTS ix_records_user_date ON records (user_id, date)",
+        # reglas por (usuario, contains): create_rule / patch_record
+        "CREATE INDEX IF NOT EXISTS ix_user_rules_user_contains ON user_rules (user_id, contains)",
+    ]),
+    (3, "jobs en segundo plano", [
+        """CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            kind VARCHAR NOT NULL,
+            status VARCHAR NOT NULL,
+            filename VARCHAR,
+            processed INTEGER NOT NULL,
+            added INTEGER NOT NULL,
+            error VARCHAR,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_jobs_id ON jobs (id)",
+        "CREATE INDEX IF NOT EXISTS ix_jobs_user_id ON jobs (user_id)",
+    ]),
+    (4, "jobs.total", [
+        "ALTER TABLE jobs ADD COLUMN total INTEGER",
+    ]),
+    (5, "estadística de gasto por categoría", [
+        """CREATE TABLE IF NOT EXISTS category_stats (
+            user_id INTEGER NOT NULL,
+            category VARCHAR NOT NULL,
+            count INTEGER NOT NULL,
+            mean FLOAT NOT NULL,
+            m2 FLOAT NOT NULL,
+            PRIMARY KEY (user_id, category),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )""",
+        # backfill con lo que ya existe (gasto = -amount); de aquí en adelante es incremental
+        """INSERT INTO category_stats (user_id, category, count, mean, m2)
+        SELECT user_id, category, COUNT(*), AVG(-amount),
+               MAX(0.0, SUM(amount * amount) - COUNT(*) * AVG(-amount) * AVG(-amount))
+        FROM records
+        WHERE amount < 0
+        GROUP BY user_id, category""",
+    ]),
+    (6, "búsqueda de texto (FTS5) sobre records.description", [
+        # contentless: el texto vive en records; el índice guarda la columna
+        # owner ("u<user_id>") para que el filtro por usuario sea parte del MATCH
+        """CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+            owner, description,
+            content='', prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS records_fts_ai AFTER INSERT ON records BEGIN
+            INSERT INTO records_fts (rowid, owner, description)
+            VALUES (new.id, 'u' || new.user_id, new.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS records_fts_ad AFTER DELETE ON records BEGIN
+            INSERT INTO records_fts (records_fts, rowid, owner, description)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS records_fts_au AFTER UPDATE OF user_id, description ON records BEGIN
+            INSERT INTO records_fts (records_fts, rowid, owner, description)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.description);
+            INSERT INTO records_fts (rowid, owner, description)
+            VALUES (new.id, 'u' || new.user_id, new.description);
+        END""",
+        "INSERT INTO records_fts (rowid, owner, description) SELECT id, 'u' || user_id, description FROM records",
+    ]),
+    (7, "change_seq por usuario para /sync", [
+        # lo que ya existe queda en la versión 1 de cada usuario
+        "ALTER TABLE records ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE user_rules ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 1",
+        "CREATE INDEX IF NOT EXISTS ix_records_user_seq ON records (user_id, change_seq)",
+        "CREATE INDEX IF NOT EXISTS ix_user_rules_user_seq ON user_rules (user_id, change_seq)",
+        """CREATE TABLE IF NOT EXISTS sync_state (
+            user_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (user_id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )""",
+        "INSERT INTO sync_state (user_id, seq) SELECT id, 1 FROM users",
+        """CREATE TABLE IF NOT EXISTS tombstones (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            entity VARCHAR NOT NULL,
+            entity_id INTEGER NOT NULL,
+            change_seq INTEGER NOT NULL,
+            deleted_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_tombstones_id ON tombstones (id)",
+        "CREATE INDEX IF NOT EXISTS ix_tombstones_user_seq ON tombstones (user_id, change_seq)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: Connection) -> int:
+    has_table = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    )).first()
+    if not has_table:
+        return 0
+    v = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return int(v or 0)
+
+
+def migrate(engine: Engine) -> List[int]:
+    """
+    Aplica las migraciones pendientes, una transacción por versión.
+    Usar un engine que abra transacciones reales (BEGIN IMMEDIATE), así dos
+    procesos que migren a la vez se serializan y el DDL es atómico.
+    Devuelve las versiones aplicadas.
+    """
+    applied = []
+    with engine.begin() as conn:
+        conn.execute(text(
+            """CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER NOT NULL PRIMARY KEY,
+                name VARCHAR NOT NULL,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL
+            )"""
+        ))
+
+    for version, name, steps in MIGRATIONS:
+        with engine.begin() as conn:
+            if version <= current_version(conn):
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(
+                text("INSERT INTO schema_version (version, name) VALUES (:v, :n)"),
+                {"v": version, "n": name},
+            )
+        applied.append(version)
+    return applied
+
+
+def check_schema(engine: Engine) -> None:
+    """
+    Arranque de workers: un solo SELECT, sin reflexión.
+    Falla si la DB no está en la última versión.
+    """
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version != LATEST_VERSION:
+        raise RuntimeError(
+            f"Esquema en versión {version}, se espera {LATEST_VERSION}. "
+            "Corre `python migrate.py` antes de levantar la API."
+        )
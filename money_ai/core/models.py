@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -32,8 +32,15 @@ class Record(Base):
     source = Column(String, default="manual", nullable=False)  # manual | recurring | import
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    change_seq = Column(Integer, default=0, nullable=False)  # /sync, lo asigna core/sync.py
+
     user = relationship("User", back_populates="records")
 
+    __table_args__ = (
+        Index("ix_records_user_date", "user_id", "date"),
+        Index("ix_records_user_seq", "user_id", "change_seq"),
+    )
+
 
 class RecurringRule(Base):
     __tablename__ = "recurring_rules"
@@ -52,3 +59,82 @@ class RecurringRule(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     user = relationship("User")
+
+
+class UserRule(Base):
+    __tablename__ = "user_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+
+    contains = Column(String, nullable=False)           # texto normalizado (normalize_contains)
+    category = Column(String, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    change_seq = Column(Integer, default=0, nullable=False)
+
+    user = relationship("User")
+
+    __table_args__ = (
+        Index("ix_user_rules_user_contains", "user_id", "contains"),
+        Index("ix_user_rules_user_seq", "user_id", "change_seq"),
+    )
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+
+    kind = Column(String, nullable=False)                       # import | records
+    status = Column(String, default="queued", nullable=False)  # queued | running | done | failed
+    filename = Column(String, nullable=True)
+
+    processed = Column(Integer, default=0, nullable=False)     # filas leídas
+    total = Column(Integer, nullable=True)                     # filas esperadas (si se conocen)
+    added = Column(Integer, default=0, nullable=False)         # records insertados
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    user = relationship("User")
+
+
+class CategoryStat(Base):
+    __tablename__ = "category_stats"
+
+    # estadística incremental (Welford) del gasto por transacción, ver core/stats.py
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category = Column(String, primary_key=True)
+
+    count = Column(Integer, default=0, nullable=False)
+    mean = Column(Float, default=0.0, nullable=False)
+    m2 = Column(Float, default=0.0, nullable=False)  # suma de cuadrados de las desviaciones
+
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+
+    # último change_seq asignado por usuario
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    seq = Column(Integer, default=0, nullable=False)
+
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    entity = Column(String, nullable=False)        # record | rule
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, nullable=False)
+
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_tombstones_user_seq", "user_id", "change_seq"),
+    )
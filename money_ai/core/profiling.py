@@ -0,0 +1,191 @@
+import functools
+import hmac
+import inspect
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional, Set
+
+from fastapi.routing import APIRoute
+
+from core.security import decode_token
+
+# =========================
+# Profiling por request (opt-in)
+# =========================
+# Se activa para UN request con el header X-Profile: <PROFILE_TOKEN> (admin) o
+# al azar con PROFILE_SAMPLE_RATE (0..1). Un hilo muestrea cada
+# PROFILE_INTERVAL_MS la pila de los hilos que están corriendo el endpoint de
+# ese request (el del threadpool si es sync, el del event loop si es async;
+# en ese caso también salen los otros requests que comparten el loop) y escribe en PROFILE_DIR un archivo de pilas colapsadas
+# ("a;b;c N" por línea, listo para flamegraph.pl / speedscope), con la ruta y el
+# user id en el nombre y en el frame raíz.
+# Si PROFILE_TOKEN y PROFILE_SAMPLE_RATE están vacíos no se instala nada.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+
+PROFILING = bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+_SAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class RequestProfile:
+    """
+    Muestras de un request. threads = hilos que están corriendo su endpoint en
+    este momento (los registra ProfiledRoute).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.threads: Set[int] = set()
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="moneyai-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[_stack(frame)] += 1
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("moneyai_profile", default=None)
+
+
+def _stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+def _wanted(scope) -> bool:
+    if PROFILE_TOKEN:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-profile":
+                return hmac.compare_digest(value, PROFILE_TOKEN.encode())
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _user_id(scope) -> str:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                try:
+                    return str(decode_token(token))
+                except Exception:
+                    break
+    return "anon"
+
+
+def write_profile(profile: RequestProfile, path: str, root: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    root = root.replace(";", ",").replace(" ", "_")
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, n in profile.samples.most_common():
+            f.write(f"{root};{stack} {n}\n")
+
+
+class ProfiledRoute(APIRoute):
+    """
+    route_class de la app cuando hay profiling: el endpoint registra su hilo
+    (threadpool si es sync, event loop si es async) en el RequestProfile del
+    request, si lo hay. Sin profile activo el costo es un ContextVar.get().
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _track_loop(endpoint)
+        else:
+            endpoint = _track_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _track_thread(fn):
+    @functools.wraps(fn)  # FastAPI lee la firma original por __wrapped__
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        ident = threading.get_ident()
+        profile.threads.add(ident)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.threads.discard(ident)
+    return wrapper
+
+
+def _track_loop(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return await fn(*args, **kwargs)
+        ident = threading.get_ident()
+        profile.threads.add(ident)
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            profile.threads.discard(ident)
+    return wrapper
+
+
+class ProfileMiddleware:
+    def __init__(self, app, directory: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.app = app
+        self.directory = directory
+        self.interval = max(0.001, interval_ms / 1000.0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        user = _user_id(scope)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        profile = RequestProfile(self.interval)
+        name = f"{stamp}-{os.getpid()}-{id(profile) & 0xffffff:06x}"
+        state = {"name": name}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+                state["route"] = route
+                state["name"] = f"{name}-{_SAFE.sub('_', route).strip('_') or 'root'}-u{user}"
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-file", f"{state['name']}.folded".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.stop()
+            _current.reset(token)
+            root = f"{scope.get('method', '')} {state.get('route') or scope.get('path', '')} u{user}"
+            write_profile(profile, os.path.join(self.directory, state["name"] + ".folded"), root)
@@ -0,0 +1,99 @@
+import logging
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, TypeVar
+
+from core.metrics import current_request
+
+# =========================
+# Modo debug de queries (dev / tests)
+# =========================
+# QUERY_DEBUG=1: se guarda el texto de cada statement del request (los eventos
+# de core/metrics.py) y al terminar se revisa:
+# - SELECTs con la misma forma repetidos >= QUERY_REPEAT_THRESHOLD veces (N+1;
+#   los INSERT por fila del flush del ORM no cuentan, en SQLite no se agrupan)
+# - rutas marcadas con @query_budget(n) que ejecutaron más de n statements
+# QUERY_BUDGET_STRICT=1 convierte el exceso de presupuesto en QueryBudgetExceeded
+# (el TestClient la re-lanza y la prueba falla). En producción va apagado.
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "0") == "1"
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0") == "1"
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "3"))
+
+log = logging.getLogger("moneyai.queries")
+
+F = TypeVar("F", bound=Callable)
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACES = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(n: int) -> Callable[[F], F]:
+    """
+    Declara el máximo de statements de un endpoint. No envuelve la función
+    (FastAPI sigue viendo la misma firma): solo la marca.
+    """
+    def mark(fn: F) -> F:
+        fn.query_budget = n
+        return fn
+    return mark
+
+
+def shape(statement: str) -> str:
+    """
+    Forma de un statement: sin literales y con las listas IN (?, ?, ...) colapsadas,
+    para que dos queries que solo cambian de parámetros se vean iguales.
+    """
+    s = _STRING.sub("?", statement)
+    s = _NUMBER.sub("?", s)
+    s = _IN_LIST.sub("(?...)", s)
+    return _SPACES.sub(" ", s).strip()
+
+
+def repeated(statements: List[str], threshold: int = QUERY_REPEAT_THRESHOLD) -> Dict[str, int]:
+    counts = Counter(shape(s) for s in statements if s.lstrip().upper().startswith(("SELECT", "WITH")))
+    return {s: n for s, n in counts.most_common() if n >= threshold}
+
+
+def check(route: str, budget: Optional[int], statements: List[str]) -> None:
+    """
+    Revisa los statements de un request. Avisa por el log "moneyai.queries";
+    con QUERY_BUDGET_STRICT=1 el exceso de presupuesto lanza QueryBudgetExceeded.
+    """
+    for s, n in repeated(statements).items():
+        log.warning("%s: posible N+1, %d veces: %s", route, n, s[:200])
+
+    if budget is not None and len(statements) > budget:
+        msg = f"{route}: {len(statements)} queries (presupuesto {budget})"
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(msg + "\n" + "\n".join(shape(s)[:200] for s in statements))
+        log.warning(msg)
+
+
+class QueryDebugMiddleware:
+    """
+    Debe quedar DENTRO de metrics.MetricsMiddleware (agregarlo antes con
+    app.add_middleware), que es quien abre el RequestStats del request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        stats = current_request.get() if scope["type"] == "http" else None
+        if stats is None:
+            await self.app(scope, receive, send)
+            return
+
+        stats.statements = []
+        await self.app(scope, receive, send)
+
+        route = scope.get("route")
+        budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+        check(getattr(route, "path", None) or "unmatched", budget, stats.statements)
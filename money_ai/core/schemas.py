@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import List
+from typing import List, Optional
 
 class RegisterIn(BaseModel):
     email: EmailStr
@@ -44,3 +44,41 @@ class RecurringOut(BaseModel):
     schedule: str
     day_of_month: int
     active: bool
+
+class RuleIn(BaseModel):
+    contains: str
+    category: str
+
+class RuleOut(BaseModel):
+    id: int
+    contains: str
+    category: str
+
+class RecordPatch(BaseModel):
+    category: Optional[str] = None
+
+class JobOut(BaseModel):
+    id: int
+    kind: str
+    status: str
+    filename: Optional[str] = None
+    processed: int
+    total: Optional[int] = None
+    added: int
+    error: Optional[str] = None
+
+
+class SyncRecordOut(RecordOut):
+    change_seq: int
+
+class SyncRuleOut(RuleOut):
+    change_seq: int
+
+class SyncOut(BaseModel):
+    since: int
+    seq: int             # siguiente since
+    has_more: bool
+    records: List[SyncRecordOut]
+    rules: List[SyncRuleOut]
+    deleted_records: List[int]
+    deleted_rules: List[int]
@@ -0,0 +1,59 @@
+import re
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.schemas import RecordOut
+
+# =========================
+# Búsqueda en descripciones (FTS5, migración 6)
+# =========================
+# records_fts lo mantienen triggers de SQLite, así que cualquier escritura
+# (ORM, imports, SQL a mano) queda indexada en la misma transacción.
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+MAX_TERMS = 8
+
+
+def fts_query(user_id: int, q: str) -> str:
+    """
+    Texto libre -> expresión MATCH: cada palabra como prefijo, todas requeridas,
+    restringida al usuario. Las comillas evitan que el texto se lea como sintaxis FTS5.
+    """
+    terms = _TOKEN.findall(q)[:MAX_TERMS]
+    if not terms:
+        raise ValueError("q vacío")
+    body = " ".join(f'"{t}"*' for t in terms)
+    return f"owner:u{int(user_id)} AND description:({body})"
+
+
+_SEARCH_SQL = text("""
+    SELECT r.id, r.date, r.description, r.amount, r.category, r.confidence, r.source
+    FROM records_fts
+    JOIN records r ON r.id = records_fts.rowid
+    WHERE records_fts MATCH :match
+    ORDER BY bm25(records_fts, 0.0, 1.0), r.date DESC, r.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+_COUNT_SQL = text("SELECT COUNT(*) FROM records_fts WHERE records_fts MATCH :match")
+
+
+def search_records(db: Session, user_id: int, q: str, limit: int, offset: int) -> Tuple[int, List[RecordOut]]:
+    match = fts_query(user_id, q)
+    total = db.execute(_COUNT_SQL, {"match": match}).scalar()
+    rows = db.execute(_SEARCH_SQL, {"match": match, "limit": limit, "offset": offset}).all()
+    return total, [
+        RecordOut(
+            id=r.id,
+            date=r.date,
+            description=r.description,
+            amount=r.amount,
+            category=r.category,
+            confidence=r.confidence,
+            source=r.source,
+        )
+        for r in rows
+    ]
@@ -1,5 +1,12 @@
+import asyncio
+import multiprocessing
 import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 
@@ -9,11 +16,122 @@ JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
 JWT_ALG = "HS256"
 JWT_EXPIRE_MIN = int(os.getenv("JWT_EXPIRE_MIN", "43200"))  # 30 días
 
-def hash_password(pw: str) -> str:
-    return PWD_CONTEXT.hash(pw)
+# bcrypt es CPU puro: corre en un pool de procesos aparte para no acaparar
+# el threadpool que atiende el resto de endpoints. hash_password / verify_password
+# son async: register / login esperan el resultado en el event loop, sin ocupar
+# un hilo del threadpool mientras tanto (una ráfaga de logins no deja sin hilos
+# a /report y demás endpoints sync).
+# HASH_POOL_SIZE=0 lo corre en un hilo aparte, sin pool de procesos (tests / dev).
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", "2"))
+HASH_QUEUE_MAX = int(os.getenv("HASH_QUEUE_MAX", "32"))  # en ejecución + en cola
 
-def verify_password(pw: str, pw_hash: str) -> bool:
-    return PWD_CONTEXT.verify(pw, pw_hash)
+class HashPoolBusy(Exception):
+    """El pool de hashing está lleno; el endpoint debe responder 503."""
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, HASH_QUEUE_MAX))
+
+_stats_lock = threading.Lock()
+HASH_STATS: Dict[str, float] = {
+    "jobs": 0,
+    "rejected": 0,
+    "in_flight": 0,
+    "queue_wait_sum": 0.0,   # segundos desde submit hasta que un proceso lo toma
+    "queue_wait_max": 0.0,
+    "hash_time_sum": 0.0,    # segundos de bcrypt dentro del proceso
+    "hash_time_max": 0.0,
+}
+
+def _hash_job(op: str, pw: str, pw_hash: Optional[str]):
+    started = time.time()
+    if op == "hash":
+        result = PWD_CONTEXT.hash(pw)
+    else:
+        result = PWD_CONTEXT.verify(pw, pw_hash)
+    return result, started, time.time()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: el server tiene hilos, fork no es seguro
+                _pool = ProcessPoolExecutor(
+                    max_workers=HASH_POOL_SIZE,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+def _reset_pool(broken: ProcessPoolExecutor) -> None:
+    # un proceso murió: el pool queda inutilizable, el siguiente request crea otro
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+def shutdown_pool() -> None:
+    """
+    Al apagar la app: termina los procesos de bcrypt (si no, quedan huérfanos
+    colgados de PID 1). Lo que estaba en cola se cancela.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _record(submitted: float, started: float, finished: float) -> None:
+    wait = max(0.0, started - submitted)
+    took = finished - started
+    with _stats_lock:
+        HASH_STATS["jobs"] += 1
+        HASH_STATS["queue_wait_sum"] += wait
+        HASH_STATS["queue_wait_max"] = max(HASH_STATS["queue_wait_max"], wait)
+        HASH_STATS["hash_time_sum"] += took
+        HASH_STATS["hash_time_max"] = max(HASH_STATS["hash_time_max"], took)
+
+async def _run(op: str, pw: str, pw_hash: Optional[str] = None):
+    if HASH_POOL_SIZE <= 0:
+        submitted = time.time()
+        result, started, finished = await asyncio.to_thread(_hash_job, op, pw, pw_hash)
+        _record(submitted, started, finished)
+        return result
+
+    # admisión: si ya hay HASH_QUEUE_MAX trabajos, rechazamos sin esperar
+    if not _slots.acquire(blocking=False):
+        with _stats_lock:
+            HASH_STATS["rejected"] += 1
+        raise HashPoolBusy("Password hashing pool saturated")
+
+    with _stats_lock:
+        HASH_STATS["in_flight"] += 1
+    try:
+        submitted = time.time()
+        pool = _get_pool()
+        try:
+            fut: Future = pool.submit(_hash_job, op, pw, pw_hash)
+            result, started, finished = await asyncio.wrap_future(fut)
+        except BrokenProcessPool:
+            _reset_pool(pool)
+            raise
+        _record(submitted, started, finished)
+        return result
+    finally:
+        with _stats_lock:
+            HASH_STATS["in_flight"] -= 1
+        _slots.release()
+
+def hash_pool_stats() -> Dict[str, float]:
+    with _stats_lock:
+        return dict(HASH_STATS)
+
+async def hash_password(pw: str) -> str:
+    return await _run("hash", pw)
+
+async def verify_password(pw: str, pw_hash: str) -> bool:
+    return await _run("verify", pw, pw_hash)
 
 def create_token(user_id: int) -> str:
     payload = {
@@ -24,8 +142,14 @@ def create_token(user_id: int) -> str:
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
 
 def decode_token(token: str) -> int:
+    return decode_token_claims(token)[0]
+
+def decode_token_claims(token: str) -> Tuple[int, float]:
+    """
+    Devuelve (user_id, exp) con exp como timestamp unix.
+    """
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
-        return int(payload["sub"])
-    except (JWTError, KeyError, ValueError):
+        return int(payload["sub"]), float(payload["exp"])
+    except (JWTError, KeyError, ValueError, TypeError):
         raise ValueError("Invalid token")
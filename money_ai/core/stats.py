@@ -0,0 +1,190 @@
+import os
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from core.models import CategoryStat, Record
+from core.txcache import UserFrame
+from ai.finance import category_spikes, month_index, transaction_spikes
+
+# =========================
+# Estadística de gasto por (usuario, categoría)
+# =========================
+# count / mean / M2 (Welford) del gasto por transacción (-amount de los
+# records con amount < 0). Se actualiza en el mismo flush que inserta, cambia
+# o borra el Record, así que un SAVEPOINT o rollback la deja consistente.
+# Detectar un gasto raro es O(1): se compara contra (mean, std) de su categoría
+# sin el propio gasto (leave_one_out).
+SPIKE_K = float(os.getenv("SPIKE_K", "3"))                   # desviaciones estándar
+SPIKE_MIN_COUNT = int(os.getenv("SPIKE_MIN_COUNT", "8"))     # historial mínimo por categoría
+SPIKE_MAX_ALERTS = int(os.getenv("SPIKE_MAX_ALERTS", "5"))
+
+Stat = Tuple[int, float, float]  # (count, mean, m2)
+
+
+def welford_add(stat: Stat, x: float) -> Stat:
+    n, mean, m2 = stat
+    n += 1
+    delta = x - mean
+    mean += delta / n
+    return n, mean, m2 + delta * (x - mean)
+
+
+def welford_remove(stat: Stat, x: float) -> Stat:
+    n, mean, m2 = stat
+    if n <= 1:
+        return 0, 0.0, 0.0
+    n_new = n - 1
+    mean_new = (n * mean - x) / n_new
+    return n_new, mean_new, max(0.0, m2 - (x - mean_new) * (x - mean))
+
+
+def leave_one_out(n: np.ndarray, mean: np.ndarray, m2: np.ndarray, x: np.ndarray):
+    """
+    (count, mean, std) de la categoría SIN el propio gasto x (arrays alineados
+    por transacción). El gasto ya está dentro de su estadística: si no se
+    saca, infla su propia línea base y con n puntos z nunca pasa de sqrt(n - 1).
+    """
+    n1 = n - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean1 = np.where(n1 > 0, (n * mean - x) / n1, 0.0)
+        m2_1 = np.maximum(0.0, m2 - (x - mean1) * (x - mean))
+        std1 = np.where(n1 > 1, np.sqrt(m2_1 / n1), 0.0)
+    return n1, mean1, std1
+
+
+def _spend(amount) -> float:
+    # None cuando el record no es gasto (no entra en la estadística)
+    return -amount if amount is not None and amount < 0 else None
+
+
+@event.listens_for(Session, "after_flush")
+def _track(session: Session, _ctx) -> None:
+    ops: Dict[Tuple[int, str], List[Tuple[int, float]]] = defaultdict(list)
+
+    for obj in session.new:
+        if isinstance(obj, Record) and _spend(obj.amount) is not None:
+            ops[(obj.user_id, obj.category)].append((1, _spend(obj.amount)))
+
+    for obj in session.deleted:
+        if isinstance(obj, Record) and _spend(obj.amount) is not None:
+            ops[(obj.user_id, obj.category)].append((-1, _spend(obj.amount)))
+
+    for obj in session.dirty:
+        if not isinstance(obj, Record):
+            continue
+        state = inspect(obj)
+        cat_h, amt_h = state.attrs.category.history, state.attrs.amount.history
+        if not (cat_h.has_changes() or amt_h.has_changes()):
+            continue
+        old_cat = cat_h.deleted[0] if cat_h.deleted else obj.category
+        old_amt = amt_h.deleted[0] if amt_h.deleted else obj.amount
+        if _spend(old_amt) is not None:
+            ops[(obj.user_id, old_cat)].append((-1, _spend(old_amt)))
+        if _spend(obj.amount) is not None:
+            ops[(obj.user_id, obj.category)].append((1, _spend(obj.amount)))
+
+    if not ops:
+        return
+
+    conn = session.connection()
+    by_user: Dict[int, List[str]] = defaultdict(list)
+    for user_id, category in ops:
+        by_user[user_id].append(category)
+
+    current: Dict[Tuple[int, str], Stat] = {}
+    for user_id, categories in by_user.items():
+        rows = conn.execute(
+            select(CategoryStat.category, CategoryStat.count, CategoryStat.mean, CategoryStat.m2)
+            .where(CategoryStat.user_id == user_id, CategoryStat.category.in_(categories))
+        ).all()
+        for cat, n, mean, m2 in rows:
+            current[(user_id, cat)] = (n, mean, m2)
+
+    values = []
+    for key, changes in ops.items():
+        stat = current.get(key, (0, 0.0, 0.0))
+        for sign, x in changes:
+            stat = welford_add(stat, x) if sign > 0 else welford_remove(stat, x)
+        values.append({"user_id": key[0], "category": key[1], "count": stat[0], "mean": stat[1], "m2": stat[2]})
+
+    stmt = insert(CategoryStat.__table__)
+    conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id", "category"],
+            set_={"count": stmt.excluded.count, "mean": stmt.excluded.mean, "m2": stmt.excluded.m2},
+        ),
+        values,
+    )
+
+
+def load_stats(db: Session, user_id: int) -> Dict[str, Stat]:
+    rows = db.execute(
+        select(CategoryStat.category, CategoryStat.count, CategoryStat.mean, CategoryStat.m2)
+        .where(CategoryStat.user_id == user_id)
+    ).all()
+    return {cat: (n, mean, m2) for cat, n, mean, m2 in rows}
+
+
+def month_alerts(db: Session, user_id: int, frame: UserFrame, mask: np.ndarray, month: str) -> List[dict]:
+    """
+    Alertas del mes, de mayor a menor z:
+    - type="category": la categoría gastó muy por encima de sus meses anteriores
+    - type="transaction": un gasto fuera de k desviaciones del historial de su categoría
+    """
+    alerts = []
+
+    totals_by_month = frame.month_totals()
+    codes, totals, means, zs = category_spikes(
+        totals_by_month.spend, totals_by_month.rows, totals_by_month.base, month_index(month), SPIKE_K,
+    )
+    for code, total, mean, z in zip(codes.tolist(), totals.tolist(), means.tolist(), zs.tolist()):
+        alerts.append({
+            "type": "category",
+            "category": frame.categories[code],
+            "amount": round(total, 2),
+            "mean": round(mean, 2),
+            "z": round(z, 2),
+        })
+
+    stats = load_stats(db, user_id)
+    lookup = [stats.get(c, (0, 0.0, 0.0)) for c in frame.categories]
+    n_by = np.array([s[0] for s in lookup], dtype=np.int64)
+    mean_by = np.array([s[1] for s in lookup], dtype=np.float64)
+    m2_by = np.array([s[2] for s in lookup], dtype=np.float64)
+
+    ids, amounts, cats = frame.ids[mask], frame.amounts[mask], frame.cats[mask]
+    spend = amounts < 0
+    ids, amounts, cats = ids[spend], amounts[spend], cats[spend]
+    # cada gasto contra el resto de su categoría, no contra sí mismo
+    count, mean, std = leave_one_out(n_by[cats], mean_by[cats], m2_by[cats], -amounts)
+    z = transaction_spikes(-amounts, mean, std, count, SPIKE_K, SPIKE_MIN_COUNT)
+    hit = np.flatnonzero(~np.isnan(z))
+    if len(hit):
+        hit = hit[np.argsort(-z[hit])][:SPIKE_MAX_ALERTS]
+        rows = db.execute(
+            select(Record.id, Record.date, Record.description)
+            .where(Record.user_id == user_id, Record.id.in_(ids[hit].tolist()))
+        ).all()
+        info = {r[0]: r for r in rows}
+        for i in hit.tolist():
+            rec = info.get(int(ids[i]))
+            if rec is None:
+                continue
+            alerts.append({
+                "type": "transaction",
+                "record_id": rec[0],
+                "date": rec[1],
+                "description": rec[2],
+                "category": frame.categories[cats[i]],
+                "amount": round(float(-amounts[i]), 2),
+                "mean": round(float(mean[i]), 2),
+                "z": round(float(z[i]), 2),
+            })
+
+    alerts.sort(key=lambda a: a["z"], reverse=True)
+    return alerts[:SPIKE_MAX_ALERTS]
@@ -0,0 +1,125 @@
+from collections import defaultdict
+from typing import Dict, List
+
+from sqlalchemy import event, select, union_all
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from core.models import Record, SyncState, Tombstone, UserRule
+from core.schemas import SyncOut, SyncRecordOut, SyncRuleOut
+
+# =========================
+# Feed de cambios por usuario (/sync)
+# =========================
+# Cada flush que toca records o user_rules de un usuario toma el siguiente
+# número de sync_state.seq y lo pone en change_seq de las filas nuevas o
+# modificadas; los borrados dejan un tombstone con ese número. El UPDATE de
+# sync_state toma el lock de escritura de SQLite hasta el commit, así que los
+# números se vuelven visibles en orden: un cliente con since=N nunca se salta
+# un cambio que se confirme después.
+_ENTITIES = {Record: "record", UserRule: "rule"}
+
+
+def next_seq(session: Session, user_id: int) -> int:
+    stmt = insert(SyncState.__table__).values(user_id=user_id, seq=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={"seq": SyncState.__table__.c.seq + 1},
+    ).returning(SyncState.__table__.c.seq)
+    return session.connection().execute(stmt).scalar_one()
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp(session: Session, _ctx, _instances) -> None:
+    changed: Dict[int, List] = defaultdict(list)
+    deleted: Dict[int, List] = defaultdict(list)
+
+    for obj in session.new:
+        if type(obj) in _ENTITIES:
+            changed[obj.user_id].append(obj)
+    for obj in session.dirty:
+        if type(obj) in _ENTITIES and session.is_modified(obj, include_collections=False):
+            changed[obj.user_id].append(obj)
+    for obj in session.deleted:
+        if type(obj) in _ENTITIES:
+            deleted[obj.user_id].append(obj)
+
+    for user_id in set(changed) | set(deleted):
+        seq = next_seq(session, user_id)
+        for obj in changed.get(user_id, ()):
+            obj.change_seq = seq
+        for obj in deleted.get(user_id, ()):
+            session.add(Tombstone(
+                user_id=user_id,
+                entity=_ENTITIES[type(obj)],
+                entity_id=obj.id,
+                change_seq=seq,
+            ))
+
+
+def current_seq(db: Session, user_id: int) -> int:
+    seq = db.execute(select(SyncState.seq).where(SyncState.user_id == user_id)).scalar()
+    return int(seq or 0)
+
+
+def changes_since(db: Session, user_id: int, since: int, limit: int) -> SyncOut:
+    """
+    Cambios con change_seq en (since, seq]. Si hay más de `limit` filas, se
+    corta en un change_seq completo (nunca a la mitad de un flush) y
+    has_more=True.
+    `limit` es un límite suave: la respuesta trae hasta `limit` filas más el
+    resto del último change_seq. Un solo flush (p. ej. un bloque de import de
+    IMPORT_CHUNK_ROWS filas) puede pasar de `limit` y llega completo, así el
+    cliente siempre avanza.
+    El cliente aplica primero los borrados y luego records / rules, y guarda seq
+    como su siguiente since.
+    """
+    current = current_seq(db, user_id)
+
+    pending = union_all(
+        select(Record.change_seq.label("s")).where(Record.user_id == user_id, Record.change_seq > since),
+        select(UserRule.change_seq.label("s")).where(UserRule.user_id == user_id, UserRule.change_seq > since),
+        select(Tombstone.change_seq.label("s")).where(Tombstone.user_id == user_id, Tombstone.change_seq > since),
+    ).subquery()
+    seqs = db.execute(select(pending.c.s).order_by(pending.c.s).limit(limit + 1)).scalars().all()
+    upto = seqs[limit - 1] if len(seqs) > limit else current
+
+    records = db.query(Record).filter(
+        Record.user_id == user_id, Record.change_seq > since, Record.change_seq <= upto,
+    ).order_by(Record.change_seq, Record.id).all()
+    rules = db.query(UserRule).filter(
+        UserRule.user_id == user_id, UserRule.change_seq > since, UserRule.change_seq <= upto,
+    ).order_by(UserRule.change_seq, UserRule.id).all()
+    tombs = db.query(Tombstone).filter(
+        Tombstone.user_id == user_id, Tombstone.change_seq > since, Tombstone.change_seq <= upto,
+    ).order_by(Tombstone.change_seq).all()
+
+    # SQLite puede reusar el id más alto tras un borrado: si el id volvió a
+    # existir después del tombstone, el borrado ya no aplica
+    live = {"record": {r.id: r.change_seq for r in records}, "rule": {r.id: r.change_seq for r in rules}}
+    gone = {"record": set(), "rule": set()}
+    for t in tombs:
+        if live[t.entity].get(t.entity_id, -1) < t.change_seq:
+            gone[t.entity].add(t.entity_id)
+
+    return SyncOut(
+        since=since,
+        seq=upto,
+        has_more=upto < current,
+        records=[
+            SyncRecordOut(
+                id=r.id,
+                date=r.date,
+                description=r.description,
+                amount=r.amount,
+                category=r.category,
+                confidence=r.confidence,
+                source=r.source,
+                change_seq=r.change_seq,
+            )
+            for r in records
+        ],
+        rules=[SyncRuleOut(id=r.id, contains=r.contains, category=r.category, change_seq=r.change_seq) for r in rules],
+        deleted_records=sorted(gone["record"]),
+        deleted_rules=sorted(gone["rule"]),
+    )
@@ -0,0 +1,394 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from core import coherence
+from core.models import Record
+
+# =========================
+# Cache columnar de transacciones por usuario
+# =========================
+# Para reportes / tendencias: todo el historial del usuario como arrays de
+# NumPy (id, día, monto, código de categoría, si vino de una regla recurrente)
+# en vez de filas ORM.
+# - LRU acotado por memoria (TXCACHE_MAX_MB, 0 = apagado)
+# - se mantiene al día con los deltas que hace el ORM (hooks de Session):
+#   altas / cambios / bajas de Record se aplican después del commit
+# - gasto por (categoría, mes) para las alertas de /report (MonthTotals): se
+#   arma la primera vez que se pide y después se mueve con los mismos deltas
+# - los commits de otros workers llegan por core/coherence.py; TXCACHE_TTL acota
+#   lo que queda (escrituras fuera del ORM)
+TXCACHE_MAX_MB = float(os.getenv("TXCACHE_MAX_MB", "256"))
+TXCACHE_TTL = float(os.getenv("TXCACHE_TTL", "300"))
+
+_EPOCH = date(1970, 1, 1).toordinal()
+BAD_DAY = np.iinfo(np.int32).min  # fecha que no se pudo interpretar
+
+_PENDING_KEY = "txcache_pending"
+
+
+def parse_days(dates: List[str]) -> np.ndarray:
+    """
+    "YYYY-MM-DD..." -> días desde 1970-01-01 (int32). Inválidas = BAD_DAY.
+    """
+    try:
+        return np.array([d[:10] for d in dates], dtype="datetime64[D]").astype(np.int32)
+    except ValueError:
+        pass
+    out = np.empty(len(dates), dtype=np.int32)
+    for i, d in enumerate(dates):
+        try:
+            out[i] = date.fromisoformat(d[:10]).toordinal() - _EPOCH
+        except (TypeError, ValueError):
+            out[i] = BAD_DAY
+    return out
+
+
+def month_bounds(month: str) -> Optional[Tuple[int, int]]:
+    """
+    "YYYY-MM" -> [inicio, fin) en días. None si no es un mes válido.
+    """
+    if len(month) != 7 or month[4] != "-":
+        return None
+    try:
+        y, m = int(month[:4]), int(month[5:])
+        start = date(y, m, 1)
+    except ValueError:
+        return None
+    end = date(y + 1, 1, 1) if m == 12 else date(y, m + 1, 1)
+    return start.toordinal() - _EPOCH, end.toordinal() - _EPOCH
+
+
+def _months(days: np.ndarray) -> np.ndarray:
+    # días desde 1970-01-01 -> meses desde 1970-01 (mismo eje que month_index)
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+class MonthTotals:
+    """
+    spend[cat, m - base]: gasto (en positivo) por categoría y mes;
+    rows[m - base]: records del mes (gasto o ingreso). Inmutable como el frame.
+    """
+
+    __slots__ = ("base", "spend", "rows")
+
+    def __init__(self, base: int, spend: np.ndarray, rows: np.ndarray):
+        self.base = base
+        self.spend = spend
+        self.rows = rows
+
+    @classmethod
+    def build(cls, days, amounts, cats, n_cats: int) -> "MonthTotals":
+        empty = cls(0, np.zeros((n_cats, 0)), np.zeros(0, dtype=np.int64))
+        return empty.updated(days, amounts, cats, n_cats, 1)
+
+    def updated(self, days, amounts, cats, n_cats: int, sign: int) -> "MonthTotals":
+        """
+        Copia con esas filas sumadas (sign=1) o restadas (sign=-1).
+        """
+        ok = days != BAD_DAY
+        months, amounts, cats = _months(days[ok]), amounts[ok], cats[ok]
+
+        lo, hi = self.base, self.base + len(self.rows)
+        if len(months):
+            lo = min(lo, int(months.min())) if len(self.rows) else int(months.min())
+            hi = max(hi, int(months.max()) + 1) if len(self.rows) else int(months.max()) + 1
+        off = self.base - lo
+        spend = np.zeros((n_cats, hi - lo))
+        spend[:self.spend.shape[0], off:off + self.spend.shape[1]] = self.spend
+        rows = np.zeros(hi - lo, dtype=np.int64)
+        rows[off:off + len(self.rows)] = self.rows
+
+        np.add.at(rows, months - lo, sign)
+        sel = amounts < 0
+        np.add.at(spend, (cats[sel], months[sel] - lo), -amounts[sel] * sign)
+        return MonthTotals(lo, spend, rows)
+
+
+class UserFrame:
+    """
+    Historial de un usuario, ordenado por id. Inmutable: cada delta crea un
+    frame nuevo, así quien ya tiene una referencia la lee sin locks.
+    """
+
+    __slots__ = ("ids", "days", "amounts", "cats", "recurring", "categories", "cat_index", "exact", "loaded_at",
+                 "_totals", "__weakref__")
+
+    def __init__(self, ids, days, amounts, cats, recurring, categories: List[str]):
+        self.ids = ids
+        self.days = days
+        self.amounts = amounts
+        self.cats = cats
+        self.recurring = recurring  # source == "recurring"
+        self.categories = categories
+        self.cat_index = {c: i for i, c in enumerate(categories)}
+        # False si alguna fecha no es ISO: el reporte debe ir a la DB
+        self.exact = not bool((days == BAD_DAY).any())
+        self.loaded_at = time.monotonic()
+        self._totals: Optional[MonthTotals] = None
+
+    @classmethod
+    def from_rows(cls, rows) -> "UserFrame":
+        ids, dates, amounts, cats, recurring = [], [], [], [], []
+        for r in rows:
+            ids.append(r[0])
+            dates.append(r[1])
+            amounts.append(r[2])
+            cats.append(r[3])
+            recurring.append(r[4] == "recurring")
+        categories, codes = np.unique(np.array(cats, dtype=object), return_inverse=True) if cats else ([], [])
+        return cls(
+            np.array(ids, dtype=np.int64),
+            parse_days(dates),
+            np.array(amounts, dtype=np.float64),
+            np.asarray(codes, dtype=np.int32).reshape(-1),
+            np.array(recurring, dtype=bool),
+            list(categories),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.ids.nbytes + self.days.nbytes + self.amounts.nbytes + self.cats.nbytes + self.recurring.nbytes
+                + sum(len(c) + 64 for c in self.categories) + 256)
+
+    def month(self, month: str) -> Optional[np.ndarray]:
+        """
+        Máscara de las filas del mes, o None si el frame no puede responderlo.
+        """
+        bounds = month_bounds(month)
+        if bounds is None or not self.exact:
+            return None
+        return (self.days >= bounds[0]) & (self.days < bounds[1])
+
+    def month_totals(self) -> MonthTotals:
+        """
+        Gasto por (categoría, mes). Se calcula una vez por historial; los
+        frames que salen de apply() lo heredan actualizado.
+        """
+        if self._totals is None:
+            self._totals = MonthTotals.build(self.days, self.amounts, self.cats, len(self.categories))
+        return self._totals
+
+    def apply(self, upserts: Dict[int, tuple], deletes: set) -> "UserFrame":
+        """
+        Frame nuevo con los deltas aplicados. upserts: id -> (date, amount, category, source).
+        """
+        categories = list(self.categories)
+        cat_index = dict(self.cat_index)
+
+        def code(c: str) -> int:
+            if c not in cat_index:
+                cat_index[c] = len(categories)
+                categories.append(c)
+            return cat_index[c]
+
+        ids, days, amounts, cats, rec = self.ids, self.days, self.amounts, self.cats, self.recurring
+        totals = self._totals
+        drop = set(deletes)
+        # cambios sobre filas existentes: se reemplazan (borrar + agregar)
+        drop.update(upserts)
+        if drop:
+            keep = ~np.isin(ids, np.fromiter(drop, dtype=np.int64, count=len(drop)))
+            if totals is not None:
+                gone = ~keep
+                totals = totals.updated(days[gone], amounts[gone], cats[gone], len(categories), -1)
+            ids, days, amounts, cats, rec = ids[keep], days[keep], amounts[keep], cats[keep], rec[keep]
+        if upserts:
+            new_ids = np.fromiter(upserts.keys(), dtype=np.int64, count=len(upserts))
+            vals = list(upserts.values())
+            new_days = parse_days([v[0] for v in vals])
+            new_amounts = np.array([v[1] for v in vals], dtype=np.float64)
+            new_cats = np.array([code(v[2]) for v in vals], dtype=np.int32)
+            if totals is not None:
+                totals = totals.updated(new_days, new_amounts, new_cats, len(categories), 1)
+            ids = np.concatenate([ids, new_ids])
+            days = np.concatenate([days, new_days])
+            amounts = np.concatenate([amounts, new_amounts])
+            cats = np.concatenate([cats, new_cats])
+            rec = np.concatenate([rec, np.array([v[3] == "recurring" for v in vals], dtype=bool)])
+            if len(ids) > 1 and (np.diff(ids) < 0).any():
+                order = np.argsort(ids, kind="stable")
+                ids, days, amounts, cats, rec = ids[order], days[order], amounts[order], cats[order], rec[order]
+
+        frame = UserFrame(ids, days, amounts, cats, rec, categories)
+        frame.loaded_at = self.loaded_at  # el TTL cuenta desde la carga de la DB
+        frame._totals = totals
+        return frame
+
+
+class TxCache:
+    def __init__(self, max_mb: float = TXCACHE_MAX_MB, ttl: float = TXCACHE_TTL):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+        self._frames: "OrderedDict[int, UserFrame]" = OrderedDict()
+        self._bytes = 0
+        # generación por usuario: una carga que se cruzó con un commit no se guarda
+        self._gen: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _drop(self, user_id: int) -> None:
+        frame = self._frames.pop(user_id, None)
+        if frame is not None:
+            self._bytes -= frame.nbytes
+
+    def _put(self, user_id: int, frame: UserFrame) -> None:
+        self._drop(user_id)
+        size = frame.nbytes
+        if size > self.max_bytes:
+            return
+        self._frames[user_id] = frame
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, old = self._frames.popitem(last=False)
+            self._bytes -= old.nbytes
+
+    def get(self, db: Session, user_id: int) -> UserFrame:
+        with self._lock:
+            frame = self._frames.get(user_id)
+            if frame is not None and time.monotonic() - frame.loaded_at < self.ttl:
+                self._frames.move_to_end(user_id)
+                self.hits += 1
+                return frame
+            self.misses += 1
+            gen = self._gen.get(user_id, 0)
+
+        rows = db.execute(
+            select(Record.id, Record.date, Record.amount, Record.category, Record.source)
+            .where(Record.user_id == user_id)
+            .order_by(Record.id)
+        ).all()
+        frame = UserFrame.from_rows(rows)
+
+        if self.enabled:
+            with self._lock:
+                if self._gen.get(user_id, 0) == gen:
+                    self._put(user_id, frame)
+        return frame
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._gen[user_id] = self._gen.get(user_id, 0) + 1
+            self._drop(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+    def apply(self, deltas: List[tuple]) -> None:
+        """
+        Aplica los deltas de un commit: ("upsert", user_id, id, date, amount, category, source)
+        o ("delete", user_id, id). En orden; el último cambio de un id gana.
+        """
+        by_user: Dict[int, Tuple[Dict[int, tuple], set]] = {}
+        for d in deltas:
+            upserts, deletes = by_user.setdefault(d[1], ({}, set()))
+            if d[0] == "upsert":
+                deletes.discard(d[2])
+                upserts[d[2]] = d[3:]
+            else:
+                upserts.pop(d[2], None)
+                deletes.add(d[2])
+
+        with self._lock:
+            for user_id, (upserts, deletes) in by_user.items():
+                self._gen[user_id] = self._gen.get(user_id, 0) + 1
+                frame = self._frames.get(user_id)
+                if frame is None:
+                    continue
+                try:
+                    self._put(user_id, frame.apply(upserts, deletes))
+                except Exception:
+                    self._drop(user_id)  # ante la duda, que se recargue
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._frames),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+txcache = TxCache()
+coherence.on_stale(txcache.invalidate)  # los pronósticos de core/forecast.py caen solos: el frame cambia
+
+
+def get_frame(db: Session, user_id: int) -> UserFrame:
+    return txcache.get(db, user_id)
+
+
+# -------------------------
+# Deltas desde el ORM
+# -------------------------
+# after_flush junta los cambios de Record en session.info, marcados con la
+# transacción (o SAVEPOINT) en curso; si esa transacción se revierte se
+# descartan, y en after_commit se aplican al cache.
+_TRACKED = ("date", "amount", "category", "source")
+
+
+def _current_tx(session: Session):
+    return session.get_nested_transaction() or session.get_transaction()
+
+
+def _within(tx, target) -> bool:
+    while tx is not None:
+        if tx is target:
+            return True
+        tx = tx.parent
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session: Session, _ctx) -> None:
+    deltas = []
+    for obj in session.new:
+        if isinstance(obj, Record):
+            deltas.append(("upsert", obj.user_id, obj.id, obj.date, obj.amount, obj.category, obj.source))
+    for obj in session.dirty:
+        if isinstance(obj, Record):
+            state = inspect(obj)
+            if any(state.attrs[k].history.has_changes() for k in _TRACKED):
+                deltas.append(("upsert", obj.user_id, obj.id, obj.date, obj.amount, obj.category, obj.source))
+    for obj in session.deleted:
+        if isinstance(obj, Record):
+            deltas.append(("delete", obj.user_id, obj.id))
+    if deltas:
+        tx = _current_tx(session)
+        session.info.setdefault(_PENDING_KEY, []).extend((tx, d) for d in deltas)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard(session: Session, previous_transaction) -> None:
+    pending = session.info.get(_PENDING_KEY)
+    if not pending:
+        return
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+        return
+    session.info[_PENDING_KEY] = [(tx, d) for tx, d in pending if not _within(tx, previous_transaction)]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        txcache.apply([d for _, d in pending])
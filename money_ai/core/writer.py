@@ -0,0 +1,148 @@
+import contextvars
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session
+
+from core.database import WriterSession
+
+T = TypeVar("T")
+
+# Cola de escritura única (opcional). SQLite solo admite un escritor a la vez:
+# en vez de que cada request pelee por el lock y pague su propio fsync, un hilo
+# junta varios requests en una sola transacción (group commit).
+WRITE_QUEUE = os.getenv("WRITE_QUEUE", "0") == "1"
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "64"))
+WRITE_BATCH_DELAY_MS = float(os.getenv("WRITE_BATCH_DELAY_MS", "5"))
+
+WriteFn = Callable[[Session], T]
+
+
+class WriteQueue:
+    """
+    Un solo hilo escritor. Cada trabajo es fn(db) -> resultado:
+    - corre dentro de un SAVEPOINT propio (si falla, solo se revierte ese trabajo)
+    - NO hace commit; el commit es uno por lote
+    - el lote se cierra al llegar a max_batch o al vencer max_delay desde el primer trabajo
+    """
+
+    def __init__(self, session_factory=WriterSession, max_batch: int = WRITE_BATCH_MAX,
+                 max_delay_ms: float = WRITE_BATCH_DELAY_MS):
+        self._session_factory = session_factory
+        self._max_batch = max(1, max_batch)
+        self._max_delay = max(0.0, max_delay_ms) / 1000.0
+        self._q: "queue.Queue[Tuple[Future, WriteFn]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.jobs = 0
+
+    def submit(self, fn: WriteFn) -> Future:
+        self._ensure_started()
+        fut: Future = Future()
+        # el trabajo corre con el contexto del request (métricas de DB por request)
+        ctx = contextvars.copy_context()
+        self._q.put((fut, lambda db: ctx.run(fn, db)))
+        return fut
+
+    def stats(self) -> dict:
+        return {"pending": self._q.qsize(), "batches": self.batches, "jobs": self.jobs}
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                t = threading.Thread(target=self._run, name="moneyai-writer", daemon=True)
+                t.start()
+                self._thread = t
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._q.get()]
+            deadline = time.monotonic() + self._max_delay
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    job = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(job)
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[Tuple[Future, WriteFn]]) -> None:
+        done = []
+        db = self._session_factory()
+        try:
+            for fut, fn in batch:
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                sp = db.begin_nested()
+                try:
+                    result = fn(db)
+                    db.flush()
+                    sp.commit()
+                except BaseException as e:
+                    sp.rollback()
+                    fut.set_exception(e)
+                    continue
+                done.append((fut, result))
+
+            db.commit()
+            self.batches += 1
+            self.jobs += len(done)
+        except BaseException as e:
+            db.rollback()
+            for fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            db.close()
+
+        for fut, result in done:
+            fut.set_result(result)
+
+
+# una cola (un hilo escritor) por DB: con SHARD_COUNT, una por shard + la del directorio (None)
+_write_queues: Dict[Optional[int], WriteQueue] = {}
+_write_queue_lock = threading.Lock()
+
+def get_write_queue(shard: Optional[int] = None) -> WriteQueue:
+    q = _write_queues.get(shard)
+    if q is None:
+        with _write_queue_lock:
+            q = _write_queues.get(shard)
+            if q is None:
+                q = _write_queues[shard] = WriteQueue(functools.partial(WriterSession, info={"shard": shard}))
+    return q
+
+def write_queue_stats() -> dict:
+    out = {"pending": 0, "batches": 0, "jobs": 0}
+    for q in list(_write_queues.values()):
+        for k, v in q.stats().items():
+            out[k] += v
+    return out
+
+def run_write(db: Session, fn: WriteFn) -> T:
+    """
+    Ejecuta una escritura de endpoint.
+    - WRITE_QUEUE=1: la manda al hilo escritor de la DB de la sesión y espera su resultado
+    - si no: la corre en la sesión del request y hace commit
+    fn no debe hacer commit y debe devolver datos planos (no objetos ORM).
+    """
+    if WRITE_QUEUE:
+        return get_write_queue(db.info.get("shard")).submit(fn).result()
+
+    try:
+        result = fn(db)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return result
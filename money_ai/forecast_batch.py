@@ -0,0 +1,28 @@
+import argparse
+import json
+import sys
+from datetime import date
+
+from core.database import SessionLocal
+from core.forecast import forecast_all
+
+# Pronóstico de todos los usuarios (cron nocturno), una línea JSON por usuario:
+#   python forecast_batch.py                 # mes actual
+#   python forecast_batch.py 2026-02 > forecast.jsonl
+
+def main():
+    ap = argparse.ArgumentParser(description="Pronóstico de fin de mes para todos los usuarios.")
+    ap.add_argument("month", nargs="?", default=date.today().strftime("%Y-%m"), help="YYYY-MM")
+    ap.add_argument("--as-of", help="YYYY-MM-DD (default: hoy)")
+    args = ap.parse_args()
+
+    as_of = date.fromisoformat(args.as_of) if args.as_of else None
+    db = SessionLocal()
+    try:
+        for user_id, forecast in forecast_all(db, args.month, as_of):
+            sys.stdout.write(json.dumps({"user_id": user_id, **forecast}, ensure_ascii=False) + "\n")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from ai.statements import PROFILES, StatementError, merge_items, parse_file
+from import_amex_xlsx import API_URL, CHUNK_SIZE, MAX_IN_FLIGHT, require_token
+from uploader import BatchUploader, UploadError, UploadUnauthorized
+
+# =========================
+# Importa muchos estados de cuenta a la vez
+# =========================
+# Ejemplos (PowerShell, con $env:TOKEN seteado):
+#   python import_statements.py estados\
+#   python import_statements.py "estados\*.xlsx" banorte.csv --profile csv
+#   python import_statements.py estados\ --dry-run
+#
+# Cada archivo se parsea en un proceso aparte; el resultado se une en un solo
+# flujo ordenado y sin traslapes (ver ai.statements.merge_items).
+
+CHECKPOINT_PATH = ".import_statements.upload.json"
+
+def supported_extensions() -> set:
+    return {ext for p in PROFILES.values() for ext in p.extensions}
+
+def expand_paths(args) -> list:
+    exts = supported_extensions()
+    paths = []
+    for arg in args:
+        if os.path.isdir(arg):
+            found = [os.path.join(arg, f) for f in os.listdir(arg)]
+        elif any(ch in arg for ch in "*?["):
+            found = glob.glob(arg)
+        else:
+            found = [arg]
+        for p in sorted(found):
+            if os.path.isfile(p) and os.path.splitext(p)[1].lower() in exts and p not in paths:
+                paths.append(p)
+    return paths
+
+def parse_all(paths, profile_name, workers):
+    """
+    Devuelve (items por archivo en el orden de paths, errores).
+    """
+    results, errors = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_file, p, profile_name) for p in paths]
+        for path, fut in zip(paths, futures):
+            try:
+                items = fut.result()
+            except StatementError as e:
+                errors.append((path, str(e)))
+                continue
+            except Exception as e:  # archivo corrupto, permisos, etc.
+                errors.append((path, f"{type(e).__name__}: {e}"))
+                continue
+            print(f"{path}: {len(items)} transacciones")
+            results.append(items)
+    return results, errors
+
+def main():
+    ap = argparse.ArgumentParser(description="Importa varios estados de cuenta (xlsx / csv).")
+    ap.add_argument("paths", nargs="+", help="archivos, carpetas o globs")
+    ap.add_argument("--profile", choices=sorted(PROFILES), help="perfil de banco (default: por extensión)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="procesos para parsear")
+    ap.add_argument("--api-url", default=API_URL)
+    ap.add_argument("--keep-going", action="store_true", help="sube aunque algún archivo falle")
+    ap.add_argument("--dry-run", action="store_true", help="solo parsea, no sube")
+    args = ap.parse_args()
+
+    paths = expand_paths(args.paths)
+    if not paths:
+        print("ERROR: No encontré archivos soportados (" + ", ".join(sorted(supported_extensions())) + ")")
+        sys.exit(1)
+
+    results, errors = parse_all(paths, args.profile, max(1, args.workers))
+    for path, msg in errors:
+        print(f"ERROR en {path}:\n{msg}")
+    if errors and not args.keep_going:
+        print("Corrige los archivos o usa --keep-going.")
+        sys.exit(1)
+
+    items = merge_items(results)
+    total = sum(len(r) for r in results)
+    print(f"Archivos: {len(results)}  Transacciones: {total}  Sin duplicados: {len(items)}")
+
+    if args.dry_run or not items:
+        return
+
+    token = require_token()
+    uploader = BatchUploader(
+        args.api_url,
+        headers={"Authorization": f"Bearer {token}"},
+        chunk_size=CHUNK_SIZE,
+        max_in_flight=MAX_IN_FLIGHT,
+        checkpoint_path=CHECKPOINT_PATH,
+    )
+    try:
+        uploader.upload(items)
+    except UploadUnauthorized as e:
+        print(f"ERROR: {e}")
+        print("Asegúrate de setear $env:TOKEN con el token correcto.")
+        sys.exit(1)
+    except UploadError as e:
+        print(f"ERROR: {e}")
+        print("Vuelve a correr el comando: retoma desde el último lote confirmado.")
+        sys.exit(1)
+
+    print("DONE ✅")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import json
+import sys
 import pandas as pd
-import requests
+
+from uploader import BatchUploader, UploadError
 
 FILE_PATH = r"actividad (3).xlsx"  # pon aquí la ruta si no está en la misma carpeta
 SHEET = "Detalles de la operación"
@@ -35,13 +37,20 @@ def main():
             "amount": round(amount, 2)
         })
 
-    # Sube en lotes para evitar requests enormes
-    chunk = 200
-    for i in range(0, len(items), chunk):
-        batch = items[i:i+chunk]
-        resp = requests.post(API_URL, json=batch, timeout=30)
-        resp.raise_for_status()
-        print(f"Uploaded {i+len(batch)}/{len(items)}")
+    # Sube en lotes para evitar requests enormes (concurrente, reanudable)
+    uploader = BatchUploader(
+        API_URL,
+        chunk_size=200,
+        max_in_flight=4,
+        timeout=30,
+        checkpoint_path=FILE_PATH + ".upload.json",
+    )
+    try:
+        uploader.upload(items)
+    except UploadError as e:
+        print(f"ERROR: {e}")
+        print("Vuelve a correr el script: retoma desde el último lote confirmado.")
+        sys.exit(1)
 
     print("DONE")
 
@@ -0,0 +1,85 @@
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import column, literal_column, select, table as raw_table
+
+from core.database import DATABASE_URL, SHARD_COUNT, SHARD_URL, shard_of, shard_writer_engines, writer_engine, writer_engines
+from core.jobs import fail_interrupted_jobs
+from core.migrations import LATEST_VERSION, migrate
+from core.models import Base
+
+# Corre una vez antes de levantar los workers:
+#   python migrate.py
+#   uvicorn app:app --workers 4
+#
+# Con SHARD_COUNT=N migra el directorio y los N shards. Para pasar una DB
+# existente a sharding (con la API apagada):
+#   SHARD_COUNT=4 python migrate.py --split
+
+SPLIT_BATCH_ROWS = 5000
+
+
+def split_shards() -> dict:
+    """
+    Mueve las filas por usuario (toda tabla con user_id salvo users) del
+    directorio a su shard, conservando los ids, y después las borra del
+    directorio. Si se corta a la mitad se puede volver a correr: las filas ya
+    copiadas se ignoran (INSERT OR IGNORE). Se copian los valores crudos
+    (columnas sin tipo): un DateTime pasado por el ORM cambiaría de formato.
+    """
+    rowid = literal_column("rowid")
+    moved = {}
+    tables = [t for t in Base.metadata.sorted_tables if "user_id" in t.c and t.name != "users"]
+    for table in tables:
+        raw = raw_table(table.name, *[column(c.name) for c in table.c])
+        n = 0
+        last = 0
+        while True:
+            with writer_engine.connect() as src:
+                rows = src.execute(
+                    select(rowid.label("_rowid"), *raw.c).where(rowid > last).order_by(rowid).limit(SPLIT_BATCH_ROWS)
+                ).all()
+            if not rows:
+                break
+            last = rows[-1]._rowid
+
+            by_shard = defaultdict(list)
+            for r in rows:
+                by_shard[shard_of(r.user_id)].append({c.name: r._mapping[c] for c in raw.c})
+            for shard, items in by_shard.items():
+                with shard_writer_engines[shard].begin() as dst:
+                    dst.execute(raw.insert().prefix_with("OR IGNORE"), items)
+            n += len(rows)
+
+        with writer_engine.begin() as conn:
+            conn.execute(table.delete())
+        moved[table.name] = n
+    return moved
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Migraciones de Money AI.")
+    ap.add_argument("--split", action="store_true", help="mueve los datos del directorio a los shards (SHARD_COUNT)")
+    args = ap.parse_args()
+
+    for e in writer_engines:
+        applied = migrate(e)
+        if applied:
+            print(f"{e.url}: migraciones aplicadas {applied}")
+        else:
+            print(f"{e.url}: sin migraciones pendientes.")
+        interrupted = fail_interrupted_jobs(e)
+        if interrupted:
+            print(f"{e.url}: {interrupted} jobs interrumpidos marcados como failed")
+    print(f"{DATABASE_URL} en versión {LATEST_VERSION}")
+    if SHARD_COUNT:
+        print(f"{SHARD_COUNT} shards: {SHARD_URL}")
+
+    if args.split:
+        if not SHARD_COUNT:
+            raise SystemExit("--split necesita SHARD_COUNT > 0")
+        for table, n in split_shards().items():
+            print(f"{table}: {n} filas movidas")
+
+if __name__ == "__main__":
+    main()
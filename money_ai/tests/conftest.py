@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# La app lee la configuración al importarse: DB temporal antes de importar app / core
+_TMP = tempfile.mkdtemp(prefix="moneyai-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ["SHARD_URL"] = f"sqlite:///{os.path.join(_TMP, 'test-shard{shard}.db')}"
+os.environ["MIGRATE_ON_STARTUP"] = "1"
+os.environ.setdefault("HASH_POOL_SIZE", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import app as app_module
+    with TestClient(app_module.app) as c:
+        yield c
+
+
+@pytest.fixture
+def auth(client):
+    """
+    Usuario nuevo por prueba; devuelve los headers con su token.
+    """
+    email = f"test-{uuid.uuid4().hex[:10]}@example.com"
+    r = client.post("/auth/register", json={"email": email, "password": "test-password"})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+@pytest.fixture
+def user_id(auth):
+    from core.security import decode_token
+
+    return decode_token(auth["Authorization"].split()[1])
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+from core import coherence, deps
+from core.txcache import txcache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# otro worker: escribe en la DB sin pasar por nuestros caches y marca el slot
+_OTHER_WORKER = """
+import sys
+from sqlalchemy import text
+from core import coherence
+from core.database import writer_engine_for
+
+user_id = int(sys.argv[1])
+with writer_engine_for(user_id).begin() as conn:
+    conn.execute(text(
+        "INSERT INTO records (user_id, date, description, amount, category, confidence, source, change_seq) "
+        "VALUES (:u, '2025-06-10', 'OTRO WORKER', -500.0, 'Otros', 1.0, 'manual', 0)"
+    ), {"u": user_id})
+coherence.mark_changed({user_id})
+"""
+
+
+def test_write_in_other_process_drops_local_caches(client, auth, user_id):
+    assert coherence._get_stamps() is not None
+    assert client.post("/records", json=[{"date": "2025-06-02", "description": "OXXO", "amount": -100.0}],
+                       headers=auth).status_code == 200
+    assert client.get("/report/2025-06", headers=auth).json()["expense"] == 100.0
+    assert user_id in txcache._frames
+    assert deps._user_cache.get(user_id) is not None
+
+    subprocess.run([sys.executable, "-c", _OTHER_WORKER, str(user_id)], cwd=ROOT, env=os.environ, check=True)
+
+    coherence.check(user_id)
+    assert user_id not in txcache._frames
+    assert deps._user_cache.get(user_id) is None
+
+    # el siguiente request recarga de la DB y ve la escritura del otro proceso
+    assert client.get("/report/2025-06", headers=auth).json()["expense"] == 600.0
+
+
+def test_own_writes_do_not_invalidate(client, auth, user_id):
+    assert client.post("/records", json=[{"date": "2025-07-02", "description": "OXXO", "amount": -100.0}],
+                       headers=auth).status_code == 200
+    client.get("/report/2025-07", headers=auth)
+    frame = txcache._frames[user_id]
+
+    coherence.check(user_id)
+    assert txcache._frames[user_id] is frame
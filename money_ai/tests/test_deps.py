@@ -0,0 +1,57 @@
+import time
+
+from jose import jwt
+
+from core import deps, security
+from core.database import SessionLocal
+from core.models import User
+
+
+def _set_user(user_id, **fields):
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        for k, v in fields.items():
+            setattr(user, k, v)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_deactivated_user_not_served_from_cache(client, auth, user_id):
+    assert client.get("/rules", headers=auth).status_code == 200
+    assert deps._user_cache.get(user_id) is not None
+
+    _set_user(user_id, is_active=False)  # after_update
+    assert deps._user_cache.get(user_id) is None
+    assert client.get("/rules", headers=auth).status_code == 401
+
+
+def test_deleted_user_not_served_from_cache(client, auth, user_id):
+    assert client.get("/rules", headers=auth).status_code == 200
+
+    db = SessionLocal()
+    try:
+        db.delete(db.get(User, user_id))  # after_delete
+        db.commit()
+    finally:
+        db.close()
+    assert deps._user_cache.get(user_id) is None
+    r = client.get("/rules", headers=auth)
+    assert r.status_code == 401
+    assert r.json()["detail"] == "User not found"
+
+
+def test_cached_token_expires_with_the_token(client, user_id):
+    exp = int(time.time()) + 2
+    token = jwt.encode({"sub": str(user_id), "exp": exp}, security.JWT_SECRET,
+                       algorithm=security.JWT_ALG)
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/rules", headers=headers).status_code == 200
+    assert deps._token_cache.get(token) == user_id
+
+    # pasa exp, aunque AUTH_CACHE_TTL sea mayor; jose compara en segundos
+    # enteros y acepta el token hasta exp + 1
+    time.sleep(exp + 1.1 - time.time())
+    assert deps._token_cache.get(token) is None
+    assert client.get("/rules", headers=headers).status_code == 401
@@ -0,0 +1,37 @@
+def _history(months):
+    items = []
+    for m in months:
+        # la categoría la pone el clasificador (RecordIn no la recibe); el
+        # pronóstico no depende de cuál sea
+        items.append({"date": f"{m}-01", "description": "RENTA DEPTO 0425", "amount": -12000.0, "source": "import"})
+        for d in range(2, 29):
+            items.append({"date": f"{m}-{d:02d}", "description": "OXXO", "amount": -100.0})
+    return items
+
+
+def test_imported_rent_not_in_run_rate(client, auth):
+    months = ["2024-02", "2024-03", "2024-04", "2024-05", "2024-06"]
+    r = client.post("/records", json=_history(months), headers=auth)
+    assert r.status_code == 200, r.text
+
+    r = client.get("/forecast/2024-06", params={"as_of": "2024-06-10"}, headers=auth)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    # la renta de junio ya está en actual; el ritmo diario es solo el gasto variable (<= 100/día)
+    assert body["actual"]["expense"] == 12000.0 + 9 * 100.0
+    assert all(c["daily"] <= 100.0 for c in body["run_rate"]["by_category"])
+    assert body["recurring_pending"]["items"] == []
+
+
+def test_imported_rent_pending_until_booked(client, auth):
+    months = ["2024-02", "2024-03", "2024-04", "2024-05"]
+    r = client.post("/records", json=_history(months), headers=auth)
+    assert r.status_code == 200, r.text
+
+    r = client.get("/forecast/2024-06", params={"as_of": "2024-05-31"}, headers=auth)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    items = body["recurring_pending"]["items"]
+    assert [(i["amount"], i["detected"]) for i in items] == [(-12000.0, True)]
+    assert body["recurring_pending"]["expense"] == 12000.0
+    assert all(c["daily"] <= 100.0 for c in body["run_rate"]["by_category"])
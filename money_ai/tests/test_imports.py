@@ -0,0 +1,33 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.responses import PlainTextResponse
+
+import app as app_module
+from core import jobs
+
+
+def test_import_rejected_by_content_length():
+    async def ok(scope, receive, send):
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    limited = jobs.ImportSizeLimit(ok)
+    limited.limit = 1024
+    c = TestClient(limited)  # sin lifespan: solo el middleware
+    assert c.post("/imports", content=b"x" * 2048).status_code == 413
+    assert c.post("/imports", content=b"x" * 512).status_code == 200
+    assert c.post("/records", content=b"x" * 2048).status_code == 200
+
+
+def test_import_temp_file_removed_when_job_not_created(client, auth, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "IMPORT_DIR", str(tmp_path))
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(app_module, "create_job", broken)
+    files = {"file": ("estado.csv", b"Fecha,Concepto,Importe\n2026-01-02,OXXO,-85.90\n", "text/csv")}
+    with pytest.raises(RuntimeError):
+        client.post("/imports", files=files, headers=auth)
+    assert os.listdir(tmp_path) == []
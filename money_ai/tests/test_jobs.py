@@ -0,0 +1,24 @@
+from core.database import SessionLocal, bind_user, writer_engine_for
+from core.jobs import INTERRUPTED_ERROR, fail_interrupted_jobs
+from core.models import Job
+from core.security import decode_token
+
+
+def test_interrupted_jobs_marked_failed(client, auth):
+    user_id = decode_token(auth["Authorization"].split()[1])
+    db = bind_user(SessionLocal(), user_id)
+    try:
+        jobs = [Job(user_id=user_id, kind="import", status=s, processed=0, added=0)
+                for s in ("queued", "running", "done")]
+        db.add_all(jobs)
+        db.commit()
+        ids = [j.id for j in jobs]
+
+        assert fail_interrupted_jobs(writer_engine_for(user_id)) >= 2
+        db.expire_all()
+        rows = {j.id: (j.status, j.error) for j in db.query(Job).filter(Job.id.in_(ids))}
+        assert rows[ids[0]] == ("failed", INTERRUPTED_ERROR)
+        assert rows[ids[1]] == ("failed", INTERRUPTED_ERROR)
+        assert rows[ids[2]] == ("done", None)
+    finally:
+        db.close()
@@ -0,0 +1,45 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core import profiling
+from core.profiling import ProfiledRoute, ProfileMiddleware
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _profiled_app(directory):
+    app = FastAPI()
+    app.router.route_class = ProfiledRoute
+
+    @app.get("/async")
+    async def async_endpoint(n: int = 1):
+        _busy(0.1)
+        return {"n": n}
+
+    @app.get("/sync")
+    def sync_endpoint():
+        _busy(0.1)
+        return {"ok": True}
+
+    return ProfileMiddleware(app, directory=str(directory), interval_ms=1)
+
+
+def test_async_and_sync_endpoints_get_samples(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    client = TestClient(_profiled_app(tmp_path))
+
+    for path, endpoint in (("/async?n=3", "async_endpoint"), ("/sync", "sync_endpoint")):
+        r = client.get(path, headers={"X-Profile": "secret"})
+        assert r.status_code == 200
+        folded = (tmp_path / r.headers["x-profile-file"]).read_text(encoding="utf-8")
+        assert f"test_profiling.py:{endpoint}" in folded
+        assert "test_profiling.py:_busy" in folded
+
+    assert client.get("/async?n=3").json() == {"n": 3}  # sin header: sin profile
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,58 @@
+def _records(months, per_month=3):
+    items = []
+    for m in months:
+        for d in range(1, per_month + 1):
+            items.append({"date": f"{m}-{d:02d}", "description": f"OXXO {m} {d}", "amount": -100.0 - d})
+    return items
+
+
+def test_report_month_before_first_record(client, auth):
+    months = [f"2024-{m:02d}" for m in range(5, 13)]
+    r = client.post("/records", json=_records(months), headers=auth)
+    assert r.status_code == 200, r.text
+
+    r = client.get("/report/2024-01", headers=auth)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["count_records"] == 0
+    assert body["alerts"] == []
+
+
+def test_report_with_history_has_totals(client, auth):
+    months = [f"2024-{m:02d}" for m in range(5, 13)]
+    client.post("/records", json=_records(months), headers=auth)
+
+    r = client.get("/report/2024-12", headers=auth)
+    assert r.status_code == 200, r.text
+    assert r.json()["expense"] == 101.0 + 102.0 + 103.0
+
+
+def test_transaction_spike_with_eight_prior_records(client, auth):
+    # 8 gastos normales en la categoría y uno muy arriba: con el propio gasto
+    # dentro de la estadística z no podía pasar de sqrt(8) < SPIKE_K
+    items = [{"date": f"2024-03-{d + 1:02d}", "description": "OXXO", "amount": -(95.0 + d)} for d in range(8)]
+    items.append({"date": "2024-04-10", "description": "OXXO", "amount": -1000.0})
+    r = client.post("/records", json=items, headers=auth)
+    assert r.status_code == 200, r.text
+
+    r = client.get("/report/2024-04", headers=auth)
+    assert r.status_code == 200, r.text
+    spikes = [a for a in r.json()["alerts"] if a["type"] == "transaction"]
+    assert [a["amount"] for a in spikes] == [1000.0]
+    assert spikes[0]["mean"] == 98.5
+
+
+def test_category_spike_alert(client, auth):
+    months = ["2024-01", "2024-02", "2024-03", "2024-04"]
+    items = [{"date": f"{m}-05", "description": "OXXO", "amount": -(100.0 + 10 * i)} for i, m in enumerate(months)]
+    items.append({"date": "2024-05-05", "description": "OXXO", "amount": -2000.0})
+    assert client.post("/records", json=items, headers=auth).status_code == 200
+
+    client.get("/report/2024-04", headers=auth)  # totales por mes ya en el frame
+    r = client.get("/records/2024-04", headers=auth)
+    assert client.delete(f"/records/{r.json()[0]['id']}", headers=auth).status_code == 200
+
+    r = client.get("/report/2024-05", headers=auth)
+    spikes = [a for a in r.json()["alerts"] if a["type"] == "category"]
+    assert [a["amount"] for a in spikes] == [2000.0]
+    assert spikes[0]["mean"] == round((100.0 + 110.0 + 120.0 + 0.0) / 4, 2)
@@ -0,0 +1,66 @@
+import uuid
+
+from sqlalchemy import text
+
+from core.database import SessionLocal, bind_user
+from core.models import Record
+
+
+def _search(client, auth, q):
+    r = client.get("/records/search", params={"q": q}, headers=auth)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _other_user(client):
+    email = f"other-{uuid.uuid4().hex[:10]}@example.com"
+    r = client.post("/auth/register", json={"email": email, "password": "test-password"})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def test_updates_and_deletes_reach_the_index(client, auth, user_id):
+    items = [
+        {"date": "2025-08-01", "description": "PANADERIA LUNA", "amount": -40.0},
+        {"date": "2025-08-02", "description": "FERRETERIA SOL", "amount": -250.0},
+    ]
+    assert client.post("/records", json=items, headers=auth).status_code == 200
+    ids = {r["description"]: r["id"] for r in client.get("/records/2025-08", headers=auth).json()}
+    assert _search(client, auth, "panad")["total"] == 1
+
+    # update por el ORM
+    db = bind_user(SessionLocal(), user_id)
+    try:
+        db.get(Record, ids["PANADERIA LUNA"]).description = "PASTELERIA LUNA"
+        db.commit()
+        # y por SQL directo: el trigger también lo ve
+        db.execute(text("UPDATE records SET description = 'TLAPALERIA SOL' WHERE id = :id"),
+                   {"id": ids["FERRETERIA SOL"]})
+        db.commit()
+    finally:
+        db.close()
+
+    assert _search(client, auth, "panad")["total"] == 0
+    assert [i["description"] for i in _search(client, auth, "pastel")["items"]] == ["PASTELERIA LUNA"]
+    assert _search(client, auth, "ferre")["total"] == 0
+    assert _search(client, auth, "tlapal")["total"] == 1
+
+    assert client.delete(f"/records/{ids['PANADERIA LUNA']}", headers=auth).status_code == 200
+    assert _search(client, auth, "pastel")["total"] == 0
+    assert _search(client, auth, "luna")["total"] == 0
+
+
+def test_search_isolated_between_users(client, auth, user_id):
+    other = _other_user(client)
+    assert client.post("/records", json=[{"date": "2025-09-01", "description": "GIMNASIO ZETA", "amount": -500.0}],
+                       headers=auth).status_code == 200
+    assert client.post("/records", json=[{"date": "2025-09-01", "description": "GIMNASIO ZETA OTRO", "amount": -1.0}],
+                       headers=other).status_code == 200
+
+    mine = _search(client, auth, "gimnasio zeta")
+    assert [i["amount"] for i in mine["items"]] == [-500.0]
+    theirs = _search(client, other, "gimnasio zeta")
+    assert [i["amount"] for i in theirs["items"]] == [-1.0]
+
+    # la sintaxis FTS5 en q no sirve para salirse del usuario
+    assert _search(client, other, f"owner:u{user_id}")["total"] == 0
+    assert _search(client, other, f'zeta" OR owner:u{user_id} OR "x')["total"] == 0
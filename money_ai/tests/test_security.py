@@ -0,0 +1,29 @@
+import multiprocessing
+import os
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from core import security
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_hash_pool_stopped_on_shutdown(monkeypatch):
+    monkeypatch.setattr(security, "HASH_POOL_SIZE", 1)
+    with TestClient(app_module.app) as c:
+        r = c.post("/auth/register", json={"email": "pool@example.com", "password": "test-password"})
+        assert r.status_code == 200, r.text
+        assert security._pool is not None
+        pids = list(security._pool._processes)
+        assert pids
+
+    assert security._pool is None
+    assert not any(_alive(pid) for pid in pids)
+    assert multiprocessing.active_children() == []
@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# El sharding se fija al importar core.database: cada escenario corre en su
+# propio proceso con su propia DB.
+_SEED = """
+import json
+from fastapi.testclient import TestClient
+import app
+
+out = {}
+with TestClient(app.app) as c:
+    for n, email in enumerate(["a@example.com", "b@example.com", "c@example.com"]):
+        r = c.post("/auth/register", json={"email": email, "password": "test-password"})
+        h = {"Authorization": "Bearer " + r.json()["access_token"]}
+        items = [{"date": f"2026-01-{d:02d}", "description": f"{email} OXXO {d}", "amount": -10.0 * d}
+                 for d in range(1, 6 + n)]
+        assert c.post("/records", json=items, headers=h).status_code == 200
+        c.post("/rules", json={"contains": email.split("@")[0] + " cafe", "category": "Comida"}, headers=h)
+        ids = [x["id"] for x in c.get("/records/2026-01", headers=h).json()]
+        c.patch(f"/records/{ids[0]}", json={"category": "Viajes"}, headers=h)
+        c.delete(f"/records/{ids[1]}", headers=h)
+        out[email] = {
+            "records": c.get("/records/2026-01", headers=h).json(),
+            "search": c.get("/records/search", params={"q": "oxxo"}, headers=h).json()["total"],
+            "report": c.get("/report/2026-01", headers=h).json()["expense"],
+            "sync": c.get("/sync", params={"since": 0}, headers=h).json(),
+        }
+print(json.dumps(out))
+"""
+
+_READ = """
+import json
+from fastapi.testclient import TestClient
+import app
+
+out = {}
+with TestClient(app.app) as c:
+    for email in ["a@example.com", "b@example.com", "c@example.com"]:
+        r = c.post("/auth/login", json={"email": email, "password": "test-password"})
+        h = {"Authorization": "Bearer " + r.json()["access_token"]}
+        out[email] = {
+            "records": c.get("/records/2026-01", headers=h).json(),
+            "search": c.get("/records/search", params={"q": "oxxo"}, headers=h).json()["total"],
+            "report": c.get("/report/2026-01", headers=h).json()["expense"],
+            "sync": c.get("/sync", params={"since": 0}, headers=h).json(),
+        }
+print(json.dumps(out))
+"""
+
+_USER_TABLES = ["records", "user_rules", "tombstones", "sync_state", "category_stats"]
+
+
+def _env(tmp_path, shards):
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'dir.db'}",
+        "SHARD_URL": f"sqlite:///{tmp_path / 'shard{shard}.db'}",
+        "SHARD_COUNT": str(shards),
+        "MIGRATE_ON_STARTUP": "1",
+        "HASH_POOL_SIZE": "0",
+        "CACHE_STAMP_FILE": str(tmp_path / "stamps"),
+    })
+    return env
+
+
+def _run(args, env):
+    out = subprocess.run([sys.executable, *args], cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    return out.stdout
+
+
+def _rows(path, table):
+    with sqlite3.connect(path) as conn:
+        return sorted(conn.execute(f"SELECT * FROM {table}").fetchall())
+
+
+def test_users_only_see_their_own_shard(tmp_path):
+    out = json.loads(_run(["-c", _SEED], _env(tmp_path, 2)).splitlines()[-1])
+
+    for n, (email, data) in enumerate(sorted(out.items())):
+        descriptions = {r["description"] for r in data["records"]}
+        assert descriptions and all(d.startswith(email) for d in descriptions)
+        assert len(data["records"]) == 5 + n - 1  # uno borrado
+        assert data["search"] == len(data["records"])
+        assert data["report"] == sum(-r["amount"] for r in data["records"])
+        assert {r["id"] for r in data["sync"]["records"]} == {r["id"] for r in data["records"]}
+
+    # user 1 y 3 -> shard 1, user 2 -> shard 0; el directorio no guarda records
+    assert _rows(tmp_path / "dir.db", "records") == []
+    assert {r[1] for r in _rows(tmp_path / "shard0.db", "records")} == {2}
+    assert {r[1] for r in _rows(tmp_path / "shard1.db", "records")} == {1, 3}
+
+
+def test_split_keeps_rows_and_sync_seq(tmp_path):
+    before = json.loads(_run(["-c", _SEED], _env(tmp_path, 0)).splitlines()[-1])
+    rows = {t: _rows(tmp_path / "dir.db", t) for t in _USER_TABLES}
+    assert all(rows.values())
+
+    _run(["migrate.py", "--split"], _env(tmp_path, 2))
+
+    for table in _USER_TABLES:
+        assert _rows(tmp_path / "dir.db", table) == []
+        shard0, shard1 = _rows(tmp_path / "shard0.db", table), _rows(tmp_path / "shard1.db", table)
+        assert sorted(shard0 + shard1) == rows[table]
+    assert len(_rows(tmp_path / "dir.db", "users")) == 3
+
+    after = json.loads(_run(["-c", _READ], _env(tmp_path, 2)).splitlines()[-1])
+    for email, data in before.items():
+        assert after[email]["records"] == data["records"]
+        assert after[email]["sync"]["seq"] == data["sync"]["seq"]
+        assert after[email]["sync"]["records"] == data["sync"]["records"]
+        assert after[email]["report"] == data["report"]
+        assert after[email]["search"] == data["search"]
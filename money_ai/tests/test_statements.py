@@ -0,0 +1,50 @@
+import pytest
+
+from ai.statements import StatementError, parse_file
+
+
+def _write_csv(tmp_path, lines, name="banco.csv"):
+    path = tmp_path / name
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_csv_decimal_comma_is_detected(tmp_path):
+    path = _write_csv(tmp_path, [
+        "Fecha;Concepto;Importe",
+        "02/01/2026;RENTA;-1.234,50",
+        "03/01/2026;OXXO;-85,90",
+        "04/01/2026;NOMINA;15.000,00",
+    ])
+    amounts = [it["amount"] for it in parse_file(path)]
+    assert amounts == [-1234.50, -85.90, 15000.0]
+
+
+def test_csv_decimal_dot_still_works(tmp_path):
+    path = _write_csv(tmp_path, [
+        "Date,Description,Amount",
+        '2026-01-02,RENT,"-1,234.50"',
+        "2026-01-03,OXXO,-85.90",
+    ])
+    amounts = [it["amount"] for it in parse_file(path)]
+    assert amounts == [-1234.50, -85.90]
+
+
+def test_csv_ambiguous_amounts_fail(tmp_path):
+    path = _write_csv(tmp_path, [
+        "Fecha;Concepto;Importe",
+        "02/01/2026;RENTA;-1.234",
+        "03/01/2026;SUPER;-2.500",
+    ])
+    with pytest.raises(StatementError, match="separador decimal"):
+        parse_file(path)
+
+
+def test_csv_mixed_separators_fail(tmp_path):
+    path = _write_csv(tmp_path, [
+        "Fecha;Concepto;Importe",
+        "02/01/2026;RENTA;-12,50",
+        "03/01/2026;SUPER;-12.50",
+    ])
+    with pytest.raises(StatementError, match="mezcla"):
+        parse_file(path)
@@ -0,0 +1,18 @@
+def _records(n, day):
+    return [{"date": f"2026-01-{day:02d}", "description": f"OXXO {i}", "amount": -10.0 - i} for i in range(n)]
+
+
+def test_sync_limit_is_soft_for_one_flush(client, auth):
+    client.post("/records", json=_records(5, 2), headers=auth)  # un solo flush: 5 filas, un change_seq
+    client.post("/records", json=_records(1, 3), headers=auth)
+
+    r = client.get("/sync", params={"since": 0, "limit": 2}, headers=auth)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    # el primer change_seq llega completo aunque pase de limit
+    assert len(body["records"]) == 5
+    assert body["has_more"] is True
+
+    body = client.get("/sync", params={"since": body["seq"], "limit": 2}, headers=auth).json()
+    assert len(body["records"]) == 1
+    assert body["has_more"] is False
@@ -0,0 +1,116 @@
+import numpy as np
+
+from core.database import SessionLocal, bind_user
+from core.models import Record
+from core.txcache import MonthTotals, UserFrame, txcache
+
+
+def _frame_rows(frame):
+    return [
+        (int(i), int(d), float(a), frame.categories[c], bool(r))
+        for i, d, a, c, r in zip(frame.ids, frame.days, frame.amounts, frame.cats, frame.recurring)
+    ]
+
+
+def _cold_report(client, auth, user_id, month):
+    txcache.invalidate(user_id)
+    return client.get(f"/report/{month}", headers=auth).json()
+
+
+def test_deltas_match_cold_rebuild(client, auth, user_id):
+    items = [{"date": f"2025-03-{d:02d}", "description": f"OXXO {d}", "amount": -50.0 * d} for d in range(1, 6)]
+    items.append({"date": "2025-03-15", "description": "NOMINA", "amount": 20000.0})
+    assert client.post("/records", json=items, headers=auth).status_code == 200
+    client.get("/report/2025-03", headers=auth)  # frame en cache
+    warm = txcache._frames[user_id]
+
+    ids = [r["id"] for r in client.get("/records/2025-03", headers=auth).json()]
+    assert client.patch(f"/records/{ids[0]}", json={"category": "Viajes"}, headers=auth).status_code == 200
+    assert client.delete(f"/records/{ids[1]}", headers=auth).status_code == 200
+    assert client.post("/records", json=[{"date": "2025-03-20", "description": "CINE", "amount": -300.0}],
+                       headers=auth).status_code == 200
+
+    # cambio de monto directo por el ORM (mismo hook)
+    db = bind_user(SessionLocal(), user_id)
+    try:
+        db.get(Record, ids[2]).amount = -999.0
+        db.commit()
+    finally:
+        db.close()
+
+    frame = txcache._frames[user_id]
+    assert frame is not warm  # se aplicaron deltas, no se recargó
+    hot_rows = _frame_rows(frame)
+    hot = client.get("/report/2025-03", headers=auth).json()
+
+    cold = _cold_report(client, auth, user_id, "2025-03")
+    assert hot == cold
+    assert hot_rows == _frame_rows(txcache._frames[user_id])
+
+
+def test_rollback_does_not_apply_deltas(client, auth, user_id):
+    assert client.post("/records", json=[{"date": "2025-04-02", "description": "OXXO", "amount": -10.0}],
+                       headers=auth).status_code == 200
+    client.get("/report/2025-04", headers=auth)
+    before = txcache._frames[user_id]
+
+    db = bind_user(SessionLocal(), user_id)
+    try:
+        # transacción completa revertida: nada llega al cache
+        # ids fijos y altos: SQLite reusaría el id revertido y taparía el delta
+        db.add(Record(id=900001, user_id=user_id, date="2025-04-03", description="X", amount=-1.0,
+                      category="Otros", confidence=1.0))
+        db.flush()
+        db.rollback()
+        assert txcache._frames[user_id] is before
+
+        # SAVEPOINT revertido: solo se aplica lo que quedó fuera de él
+        sp = db.begin_nested()
+        db.add(Record(id=900002, user_id=user_id, date="2025-04-04", description="DESCARTADO", amount=-2.0,
+                      category="Otros", confidence=1.0))
+        db.flush()
+        sp.rollback()
+        db.add(Record(user_id=user_id, date="2025-04-05", description="GUARDADO", amount=-3.0,
+                      category="Otros", confidence=1.0))
+        db.commit()
+    finally:
+        db.close()
+
+    frame = txcache._frames[user_id]
+    assert sorted(np.round(frame.amounts, 2).tolist()) == [-10.0, -3.0]
+    hot = client.get("/report/2025-04", headers=auth).json()
+    assert hot == _cold_report(client, auth, user_id, "2025-04")
+
+
+def _dense(totals, lo, hi):
+    out = np.zeros((totals.spend.shape[0], hi - lo))
+    rows = np.zeros(hi - lo, dtype=np.int64)
+    for m in range(lo, hi):
+        j = m - totals.base
+        if 0 <= j < len(totals.rows):
+            out[:, m - lo] = totals.spend[:, j]
+            rows[m - lo] = totals.rows[j]
+    return np.round(out, 6), rows
+
+
+def test_month_totals_follow_deltas():
+    frame = UserFrame.from_rows([
+        (1, "2025-01-05", -100.0, "Comida", "manual"),
+        (2, "2025-02-05", -50.0, "Comida", "manual"),
+        (3, "2025-02-06", 900.0, "Ingreso", "manual"),
+        (4, "2025-03-07", -20.0, "Cine", "manual"),
+    ])
+    frame.month_totals()
+    frame = frame.apply(
+        {2: ("2025-04-01", -75.0, "Viajes", "manual"), 5: ("2024-12-31", -10.0, "Comida", "manual")},
+        {1},
+    )
+
+    incremental = frame.month_totals()
+    cold = MonthTotals.build(frame.days, frame.amounts, frame.cats, len(frame.categories))
+    lo = min(incremental.base, cold.base)
+    hi = max(incremental.base + len(incremental.rows), cold.base + len(cold.rows))
+    inc_spend, inc_rows = _dense(incremental, lo, hi)
+    cold_spend, cold_rows = _dense(cold, lo, hi)
+    assert np.array_equal(inc_rows, cold_rows)
+    assert np.array_equal(inc_spend, cold_spend)
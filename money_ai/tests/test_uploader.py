@@ -0,0 +1,55 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from uploader import BatchUploader, UploadError, UploadUnauthorized
+
+
+class _Reject(BaseHTTPRequestHandler):
+    status = 422
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"detail": "amount must be a number"}'
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Unauthorized(_Reject):
+    status = 401
+
+
+def _serve(handler):
+    server = HTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_non_retried_status_raises_upload_error():
+    server = _serve(_Reject)
+    try:
+        uploader = BatchUploader(f"http://127.0.0.1:{server.server_port}/records", retries=0)
+        with pytest.raises(UploadError, match="HTTP 422: .*amount must be a number"):
+            uploader.post_batch([{"date": "2026-01-01", "description": "x", "amount": "x"}])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unauthorized_raises_instead_of_exiting():
+    server = _serve(_Unauthorized)
+    try:
+        uploader = BatchUploader(f"http://127.0.0.1:{server.server_port}/records", retries=3)
+        with pytest.raises(UploadUnauthorized, match="HTTP 401"):
+            uploader.post_batch([{"date": "2026-01-01", "description": "x", "amount": 1}])
+        assert issubclass(UploadUnauthorized, UploadError)
+    finally:
+        server.shutdown()
+        server.server_close()
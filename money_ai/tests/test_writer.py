@@ -0,0 +1,72 @@
+import pytest
+
+from core import writer
+from core.database import SessionLocal, bind_user
+from core.models import Record
+from core.writer import WriteQueue, run_write
+
+
+def _add(user_id, description, fail=False):
+    def work(s):
+        rec = Record(user_id=user_id, date="2026-02-01", description=description, amount=-1.0,
+                     category="Otros", confidence=1.0)
+        s.add(rec)
+        s.flush()
+        if fail:
+            raise ValueError(f"falla {description}")
+        return rec.id
+    return work
+
+
+def _descriptions(user_id, prefix):
+    db = bind_user(SessionLocal(), user_id)
+    try:
+        rows = db.query(Record.description).filter(
+            Record.user_id == user_id, Record.description.startswith(prefix),
+        ).all()
+        return sorted(r[0] for r in rows)
+    finally:
+        db.close()
+
+
+def test_failing_job_rolls_back_only_its_savepoint(user_id):
+    q = WriteQueue(max_batch=3, max_delay_ms=2000)
+    futs = [
+        q.submit(_add(user_id, "batch-a")),
+        q.submit(_add(user_id, "batch-b", fail=True)),
+        q.submit(_add(user_id, "batch-c")),
+    ]
+
+    assert isinstance(futs[0].result(timeout=10), int)
+    with pytest.raises(ValueError, match="falla batch-b"):
+        futs[1].result(timeout=10)
+    assert isinstance(futs[2].result(timeout=10), int)
+
+    # un solo commit para los tres; el fallido no dejó su fila
+    assert q.stats()["batches"] == 1
+    assert q.stats()["jobs"] == 2
+    assert _descriptions(user_id, "batch-") == ["batch-a", "batch-c"]
+
+
+def test_run_write_with_queue_returns_results_and_errors(user_id, monkeypatch):
+    monkeypatch.setattr(writer, "WRITE_QUEUE", True)
+    db = bind_user(SessionLocal(), user_id)
+    try:
+        assert isinstance(run_write(db, _add(user_id, "queued-ok")), int)
+        with pytest.raises(ValueError, match="falla queued-bad"):
+            run_write(db, _add(user_id, "queued-bad", fail=True))
+    finally:
+        db.close()
+
+    assert _descriptions(user_id, "queued-") == ["queued-ok"]
+
+
+def test_one_write_queue_per_shard():
+    assert writer.get_write_queue(None) is writer.get_write_queue(None)
+    q0 = writer.get_write_queue(0)
+    assert q0 is not writer.get_write_queue(None)
+    db = q0._session_factory()
+    try:
+        assert db.info["shard"] == 0
+    finally:
+        db.close()
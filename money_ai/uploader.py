@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status que vale la pena reintentar (el server no procesó el lote o está saturado)
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadUnauthorized(UploadError):
+    """401: token inválido o faltante. Reintentar no sirve."""
+
+
+class BatchUploader:
+    """
+    Sube items en lotes:
+    - conexiones reutilizadas (una Session con pool de max_in_flight conexiones)
+    - hasta max_in_flight lotes en paralelo
+    - reintentos con backoff exponencial + jitter en errores de red / 429 / 5xx
+    - checkpoint en disco: al reanudar solo se suben los lotes no confirmados
+
+    El checkpoint se invalida si cambian los items, el tamaño de lote o la URL.
+    Ojo: un lote que dio timeout pudo haberse guardado en el server; solo se
+    marcan como hechos los lotes con respuesta 2xx.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        headers: Optional[Dict[str, str]] = None,
+        chunk_size: int = 200,
+        max_in_flight: int = 4,
+        retries: int = 5,
+        backoff: float = 0.5,
+        timeout: float = 60,
+        checkpoint_path: Optional[str] = None,
+    ):
+        self.api_url = api_url
+        self.chunk_size = chunk_size
+        self.max_in_flight = max(1, max_in_flight)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.checkpoint_path = checkpoint_path
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+
+    # ===== checkpoint =====
+    def _fingerprint(self, items: List[dict]) -> str:
+        h = hashlib.sha256()
+        h.update(f"{self.api_url}|{self.chunk_size}|".encode("utf-8"))
+        h.update(json.dumps(items, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return h.hexdigest()
+
+    def _load_checkpoint(self, fingerprint: str) -> set:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return set()
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        if data.get("fingerprint") != fingerprint:
+            return set()
+        return set(data.get("done", []))
+
+    def _save_checkpoint(self, fingerprint: str, done: set) -> None:
+        if not self.checkpoint_path:
+            return
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "done": sorted(done)}, f)
+        os.replace(tmp, self.checkpoint_path)  # atómico: nunca queda a medias
+
+    def _clear_checkpoint(self) -> None:
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    # ===== envío =====
+    def post_batch(self, batch: List[dict]) -> dict:
+        attempt = 0
+        while True:
+            try:
+                resp = self.session.post(self.api_url, json=batch, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                err = f"{type(e).__name__}: {e}"
+            else:
+                if resp.status_code == 401:
+                    raise UploadUnauthorized("HTTP 401: token inválido o faltante")
+                if resp.status_code < 400:
+                    return resp.json()
+                if resp.status_code not in RETRY_STATUS:
+                    # 4xx / 5xx que no se reintenta: el lote no se va a aceptar tal cual
+                    try:
+                        resp.raise_for_status()
+                    except requests.HTTPError as exc:
+                        raise UploadError(f"HTTP {resp.status_code}: {resp.text[:200]}") from exc
+                err = f"HTTP {resp.status_code}"
+
+            attempt += 1
+            if attempt > self.retries:
+                raise UploadError(f"Lote falló tras {self.retries} reintentos ({err})")
+            delay = self.backoff * (2 ** (attempt - 1))
+            time.sleep(delay + random.uniform(0, delay))
+
+    def upload(self, items: List[dict]) -> int:
+        """
+        Sube todo lo pendiente. Devuelve cuántos items se subieron en esta corrida.
+        Si un lote falla definitivamente, el checkpoint conserva lo confirmado.
+        """
+        batches = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        fingerprint = self._fingerprint(items)
+        done = self._load_checkpoint(fingerprint)
+
+        pending = [i for i in range(len(batches)) if i not in done]
+        if done:
+            print(f"Reanudando: {len(done)}/{len(batches)} lotes ya confirmados")
+
+        uploaded = sum(len(batches[i]) for i in done)
+        sent = 0
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            futures = {pool.submit(self.post_batch, batches[i]): i for i in pending}
+            try:
+                for fut in as_completed(futures):
+                    idx = futures[fut]
+                    out = fut.result()
+                    with self._lock:
+                        done.add(idx)
+                        self._save_checkpoint(fingerprint, done)
+                    uploaded += len(batches[idx])
+                    sent += len(batches[idx])
+                    print(f"Uploaded {uploaded}/{len(items)} - server: {out}")
+            except BaseException:
+                for f in futures:
+                    f.cancel()
+                raise
+
+        self._clear_checkpoint()
+        return sent